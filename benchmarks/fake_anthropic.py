@@ -0,0 +1,181 @@
+"""
+Fake Anthropic Messages API for benchmarks and load tests
+
+Answers POST /v1/messages like the real API, streamed (server-sent events)
+or not, after a configurable time to first token and at a configurable
+token rate, so agent calls can be measured without a network or an API
+key. Point the app at it with "base_url" in config.json:
+
+    python benchmarks/fake_anthropic.py --port 8765 --latency-ms 400 --tokens-per-s 60
+    # config.json: "base_url": "http://127.0.0.1:8765", "anthropic_api_key": "fake"
+
+benchmarks/suite.py starts one in-process with FakeAnthropic.
+"""
+
+import argparse
+import itertools
+import json
+import random
+import sys
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+from typing import Any, Dict, Iterator, List, Optional
+
+WORDS: List[str] = ("let's break this into tiny steps first open the file then write one test "
+                    "you've got this the hard part is starting so just do five minutes and "
+                    "take a break after celebrate small wins").split()
+
+
+class FakeAnthropic:
+    """A local Messages API stub running on a background thread"""
+
+    def __init__(self, latency_ms: float = 300.0, tokens_per_s: float = 80.0, reply_tokens: int = 120,
+                 port: int = 0, seed: int = 0) -> None:
+        self.latency_ms: float = latency_ms
+        self.tokens_per_s: float = tokens_per_s
+        self.reply_tokens: int = reply_tokens
+        self.random: random.Random = random.Random(seed)
+        self.ids: Iterator[int] = itertools.count(1)
+        self.requests: int = 0
+
+        fake: FakeAnthropic = self
+
+        class Handler(MessagesHandler):
+            server_fake = fake
+
+        self.server: ThreadingHTTPServer = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.server.daemon_threads = True
+        self.thread: Thread = Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        """URL to use as the client's base_url"""
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeAnthropic":
+        """Start serving in the background"""
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop serving and release the port"""
+        self.server.shutdown()
+        self.server.server_close()
+
+    def reply_words(self) -> List[str]:
+        """A reply of reply_tokens words, one token each"""
+        return self.random.choices(WORDS, k=self.reply_tokens)
+
+
+class MessagesHandler(BaseHTTPRequestHandler):
+    """Handles POST /v1/messages for FakeAnthropic"""
+
+    protocol_version = "HTTP/1.1"
+    server_fake: FakeAnthropic
+
+    def log_message(self, format: str, *args: Any) -> None:
+        """Keep benchmark output clean"""
+
+    def handle(self) -> None:
+        """Serve the connection, ending quietly if the client hangs up, e.g. on a cancelled call"""
+        try:
+            super().handle()
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+
+    def do_POST(self) -> None:
+        """Answer a Messages API request"""
+        if self.path.split("?")[0] != "/v1/messages":
+            self.send_error(404)
+            return
+        body: Dict[str, Any] = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        fake: FakeAnthropic = self.server_fake
+        fake.requests += 1
+
+        message_id: str = f"msg_fake{next(fake.ids)}"
+        input_tokens: int = len(json.dumps(body.get("system", "")) + json.dumps(body["messages"])) // 4
+        words: List[str] = fake.reply_words()
+        time.sleep(fake.latency_ms / 1000)
+
+        if body.get("stream"):
+            self.stream(body, message_id, input_tokens, words)
+            return
+
+        time.sleep(len(words) / fake.tokens_per_s)
+        payload: bytes = json.dumps(self.message(body, message_id, " ".join(words), input_tokens,
+                                                 len(words), "end_turn")).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    @staticmethod
+    def message(body: Dict[str, Any], message_id: str, text: Optional[str], input_tokens: int,
+                output_tokens: int, stop_reason: Optional[str]) -> Dict[str, Any]:
+        """A Messages API message object"""
+        return {
+            "id": message_id,
+            "type": "message",
+            "role": "assistant",
+            "model": body.get("model", "fake"),
+            "content": [{"type": "text", "text": text}] if text is not None else [],
+            "stop_reason": stop_reason,
+            "stop_sequence": None,
+            "usage": {"input_tokens": input_tokens, "output_tokens": output_tokens,
+                      "cache_creation_input_tokens": 0, "cache_read_input_tokens": 0}
+        }
+
+    def stream(self, body: Dict[str, Any], message_id: str, input_tokens: int, words: List[str]) -> None:
+        """Send the reply as server-sent events, one word per delta at tokens_per_s"""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        def event(kind: str, data: Dict[str, Any]) -> None:
+            self.wfile.write(f"event: {kind}\ndata: {json.dumps({'type': kind, **data})}\n\n".encode())
+            self.wfile.flush()
+
+        try:
+            event("message_start", {"message": self.message(body, message_id, None, input_tokens, 1, None)})
+            event("content_block_start", {"index": 0, "content_block": {"type": "text", "text": ""}})
+            interval: float = 1 / self.server_fake.tokens_per_s
+            for i, word in enumerate(words):
+                if i:
+                    time.sleep(interval)
+                event("content_block_delta", {"index": 0, "delta": {"type": "text_delta",
+                                                                     "text": word if i == 0 else f" {word}"}})
+            event("content_block_stop", {"index": 0})
+            event("message_delta", {"delta": {"stop_reason": "end_turn", "stop_sequence": None},
+                                    "usage": {"output_tokens": len(words)}})
+            event("message_stop", {})
+        except (BrokenPipeError, ConnectionResetError):
+            # The client stopped reading, e.g. a cancelled request; nothing left to send
+            pass
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Serve until interrupted"""
+    parser = argparse.ArgumentParser(description="Fake Anthropic Messages API")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=300.0, help="time to first token")
+    parser.add_argument("--tokens-per-s", type=float, default=80.0, help="streaming token rate")
+    parser.add_argument("--reply-tokens", type=int, default=120, help="tokens per reply")
+    args = parser.parse_args(argv)
+
+    fake: FakeAnthropic = FakeAnthropic(args.latency_ms, args.tokens_per_s, args.reply_tokens, args.port)
+    print(f"Fake Messages API on {fake.base_url}", flush=True)
+    try:
+        fake.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+"""
+Startup benchmark: how long each entry point takes to import
+
+Uses python -X importtime in a fresh interpreter per run and keeps the
+fastest of several runs. The Anthropic SDK (with httpx and pydantic) must
+not be imported up front: the GUI imports it during warm-up, after its
+window is up, and the CLI only when a command needs Claude.
+
+    python benchmarks/startup.py
+    python benchmarks/startup.py --runs 10 --budget-ms 250
+"""
+
+import argparse
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional
+
+REPO_DIR: Path = Path(__file__).resolve().parent.parent
+ENTRY_POINTS: List[str] = ["productivity_trio", "trio_cli", "trio_core"]
+DEFERRED_MODULES: List[str] = ["anthropic", "httpx", "pydantic"]
+
+
+class ImportTime(NamedTuple):
+    """One line of -X importtime output"""
+    module: str
+    self_us: int
+    cumulative_us: int
+
+
+def measure(module: str) -> List[ImportTime]:
+    """Import a module in a fresh interpreter and parse its -X importtime report"""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=REPO_DIR, capture_output=True, text=True, check=True)
+    times: List[ImportTime] = []
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        times.append(ImportTime(name.strip(), int(self_us), int(cumulative_us)))
+    return times
+
+
+def total_us(times: List[ImportTime], module: str) -> int:
+    """Cumulative import time of the entry point itself"""
+    return next(t.cumulative_us for t in reversed(times) if t.module == module)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Report import times; returns non-zero when a check fails"""
+    parser = argparse.ArgumentParser(description="Measure entry point import times")
+    parser.add_argument("--runs", type=int, default=5, help="runs per entry point (best is kept)")
+    parser.add_argument("--budget-ms", type=float, help="fail if an entry point takes longer than this")
+    parser.add_argument("--top", type=int, default=8, help="slowest modules to list per entry point")
+    args = parser.parse_args(argv)
+
+    failed: bool = False
+    for entry_point in ENTRY_POINTS:
+        runs: List[List[ImportTime]] = [measure(entry_point) for _ in range(args.runs)]
+        best: List[ImportTime] = min(runs, key=lambda times: total_us(times, entry_point))
+        best_ms: float = total_us(best, entry_point) / 1000
+
+        print(f"{entry_point}: {best_ms:.1f} ms (best of {args.runs})")
+        for t in sorted(best, key=lambda t: t.self_us, reverse=True)[:args.top]:
+            print(f"    {t.self_us / 1000:7.1f} ms  {t.module}")
+
+        loaded: Dict[str, bool] = {name: any(t.module == name for t in best) for name in DEFERRED_MODULES}
+        eager: List[str] = [name for name, imported in loaded.items() if imported]
+        if eager:
+            print(f"  FAIL: imported at startup: {', '.join(eager)}")
+            failed = True
+        if args.budget_ms is not None and best_ms > args.budget_ms:
+            print(f"  FAIL: over the {args.budget_ms:.0f} ms budget")
+            failed = True
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
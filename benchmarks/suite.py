@@ -0,0 +1,280 @@
+"""
+Benchmark suite: history reads, stats, write throughput, team discussions
+and cold start
+
+Runs headless against a synthetic database and a local fake of the Messages
+API (fake_anthropic.py), and writes machine-readable results so runs can be
+compared against a baseline:
+
+    python benchmarks/suite.py --output baseline.json
+    python benchmarks/suite.py --compare baseline.json   # exits 1 on a regression
+    python benchmarks/suite.py --quick                   # small database, fewer runs
+
+The synthetic database (see synthetic.py) is built once per size and seed
+under --work-dir and reused, since indexing a million messages takes a while. Rows the benchmarks
+write are deleted again afterwards.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+REPO_DIR: Path = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_DIR))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from fake_anthropic import FakeAnthropic  # noqa: E402
+from synthetic import DatasetSpec, Generator, generate  # noqa: E402
+from trio_core import AGENTS, CONFIG_FILE, DB_NAME, TrioCore, percentile  # noqa: E402
+
+WRITE_BENCH_ROWS: int = 5000  # Messages queued by the save_conversation benchmark
+REGRESSION_TOLERANCE: float = 0.25  # Slower than the baseline by more than this fails --compare
+
+# Metrics compared by --compare, and whether higher is better
+COMPARED: Dict[str, bool] = {"p50_ms": False, "p95_ms": False, "rows_per_s": True}
+
+
+def summarize(samples: List[float]) -> Dict[str, Any]:
+    """Summary statistics of timings in seconds, in milliseconds"""
+    ordered: List[float] = sorted(sample * 1000 for sample in samples)
+    return {
+        "n": len(ordered),
+        "mean_ms": round(statistics.fmean(ordered), 3),
+        "p50_ms": round(percentile(ordered, 0.5), 3),
+        "p95_ms": round(percentile(ordered, 0.95), 3),
+        "min_ms": round(ordered[0], 3),
+        "max_ms": round(ordered[-1], 3)
+    }
+
+
+def time_calls(call: Callable[[], Any], count: int) -> List[float]:
+    """Run call count times and return each duration in seconds"""
+    samples: List[float] = []
+    for _ in range(count):
+        start: float = time.perf_counter()
+        call()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def write_config(base_url: str) -> None:
+    """Point the app in the current directory at the fake API, without rate limiting"""
+    with open(CONFIG_FILE, "w") as f:
+        json.dump({
+            "anthropic_api_key": "fake",
+            "base_url": base_url,
+            "streaming": True,
+            "requests_per_minute": 1000000,
+            "input_tokens_per_minute": 1000000000,
+            "max_concurrent_requests": 16
+        }, f, indent=2)
+
+
+def rows_in(core: TrioCore) -> int:
+    """Number of conversation rows"""
+    return core.db.query_one('SELECT IFNULL(MAX(id), 0) FROM conversations')[0]
+
+
+def bench_history(core: TrioCore, rng: random.Random, projects: int, iterations: int) -> Dict[str, Any]:
+    """Newest page of an agent's history, then the page before a random point in it"""
+    targets: List[Tuple[int, str]] = [(rng.randint(1, max(1, projects // 10)), rng.choice(list(AGENTS)))
+                                      for _ in range(iterations)]
+    newest: List[float] = []
+    paged: List[float] = []
+    for project_id, agent_id in targets:
+        start: float = time.perf_counter()
+        page: List[Tuple[Any, ...]] = core.get_conversation_history(project_id, agent_id, limit=25)
+        newest.append(time.perf_counter() - start)
+        if page:
+            before_id: int = rng.randint(1, page[0][3])
+            start = time.perf_counter()
+            core.get_conversation_history(project_id, agent_id, limit=25, before_id=before_id)
+            paged.append(time.perf_counter() - start)
+    return {"get_conversation_history": summarize(newest),
+            "get_conversation_history_before_id": summarize(paged)}
+
+
+def bench_stats(core: TrioCore, rng: random.Random, projects: int, iterations: int) -> Dict[str, Any]:
+    """The stats panel's read (update_stats without the Tk label)"""
+    return {"update_stats": summarize(time_calls(
+        lambda: core.get_project_stats(rng.randint(1, projects)), iterations))}
+
+
+def bench_writes(core: TrioCore, project_id: int) -> Dict[str, Any]:
+    """Queue WRITE_BENCH_ROWS messages and wait for them to be committed"""
+    generator: Generator = Generator(DatasetSpec(1, WRITE_BENCH_ROWS, seed=1))
+    rows: List[Tuple[Any, ...]] = list(generator.conversations([project_id]))
+    start: float = time.perf_counter()
+    for _, agent, message, _, _ in rows:
+        core.save_conversation(project_id, agent, message)
+    queued: float = time.perf_counter() - start
+    core.db.flush()
+    elapsed: float = time.perf_counter() - start
+    return {"save_conversation": {
+        "n": WRITE_BENCH_ROWS,
+        "rows_per_s": round(WRITE_BENCH_ROWS / elapsed, 1),
+        "queue_us_per_row": round(queued / WRITE_BENCH_ROWS * 1e6, 2),
+        "total_ms": round(elapsed * 1000, 3)
+    }}
+
+
+def bench_team(core: TrioCore, project_id: int, runs: int) -> Dict[str, Any]:
+    """Wall time of a streamed team discussion (both agents in parallel)"""
+    core.current_project_id = project_id
+    samples: List[float] = time_calls(
+        lambda: core.runtime.submit(core.team_discussion(project_id, "Should I ship this week?")).result(), runs)
+    return {"team_discussion": summarize(samples)}
+
+
+def bench_cold_start(runs: int) -> Dict[str, Any]:
+    """Fresh interpreter until the core is warmed up and the last project is found"""
+    script: str = (f"import sys; sys.path.insert(0, {str(REPO_DIR)!r}); "
+                   "from trio_core import TrioCore; core = TrioCore(); core.latest_project_id(); core.close()")
+    samples: List[float] = time_calls(
+        lambda: subprocess.run([sys.executable, "-c", script], check=True), runs)
+    return {"cold_start": summarize(samples)}
+
+
+def clean_up(core: TrioCore, marks: Dict[str, int]) -> None:
+    """Delete rows written by the benchmarks, so the database can be reused as is"""
+    core.db.flush()
+    with core.db.transaction() as cursor:
+        for table, last_id in marks.items():
+            cursor.execute(f'DELETE FROM {table} WHERE id > ?', (last_id,))
+        cursor.execute('DELETE FROM project_stats WHERE project_id > ?', (marks["projects"],))
+        cursor.execute('DELETE FROM conversation_summaries WHERE project_id > ?', (marks["projects"],))
+
+
+def git_commit() -> Optional[str]:
+    """Commit the benchmarks ran against, if this is a git checkout"""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> bool:
+    """Print each compared metric against the baseline; returns True if none regressed"""
+    ok: bool = True
+    for name, metrics in results["results"].items():
+        for key, higher_is_better in COMPARED.items():
+            old: Optional[float] = baseline.get("results", {}).get(name, {}).get(key)
+            new: Optional[float] = metrics.get(key)
+            if not old or new is None:
+                continue
+            change: float = (new - old) / old
+            regressed: bool = change < -tolerance if higher_is_better else change > tolerance
+            print(f"  {name}.{key}: {old:.3f} -> {new:.3f} ({change:+.0%}){'  REGRESSION' if regressed else ''}",
+                  file=sys.stderr)
+            ok = ok and not regressed
+    return ok
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Run the suite; returns non-zero when --compare finds a regression"""
+    parser = argparse.ArgumentParser(description="Benchmark the app headless against a fake API")
+    parser.add_argument("--projects", type=int, default=1000)
+    parser.add_argument("--messages", type=int, default=1000000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--iterations", type=int, default=500, help="samples per database benchmark")
+    parser.add_argument("--runs", type=int, default=5, help="team discussions and cold starts to time")
+    parser.add_argument("--latency-ms", type=float, default=300.0, help="fake API time to first token")
+    parser.add_argument("--tokens-per-s", type=float, default=80.0, help="fake API streaming rate")
+    parser.add_argument("--reply-tokens", type=int, default=120, help="fake API tokens per reply")
+    parser.add_argument("--work-dir", default=str(REPO_DIR / "benchmarks" / ".data"),
+                        help="where synthetic databases are kept")
+    parser.add_argument("--quick", action="store_true", help="50 projects, 20k messages, fewer samples")
+    parser.add_argument("--output", "-o", help="write results JSON here (default: stdout)")
+    parser.add_argument("--compare", help="baseline results JSON; exit 1 on a regression")
+    parser.add_argument("--tolerance", type=float, default=REGRESSION_TOLERANCE)
+    args = parser.parse_args(argv)
+    if args.quick:
+        args.projects, args.messages, args.iterations, args.runs = 50, 20000, 100, 3
+    # The suite runs from the database's directory, so resolve paths first
+    output: Optional[Path] = Path(args.output).resolve() if args.output else None
+    baseline_path: Optional[Path] = Path(args.compare).resolve() if args.compare else None
+
+    data_dir: Path = Path(args.work_dir) / f"p{args.projects}-m{args.messages}-s{args.seed}"
+    data_dir.mkdir(parents=True, exist_ok=True)
+    os.chdir(data_dir)
+
+    fake: FakeAnthropic = FakeAnthropic(args.latency_ms, args.tokens_per_s, args.reply_tokens).start()
+    write_config(fake.base_url)
+    core: TrioCore = TrioCore()
+    results: Dict[str, Any] = {}
+    try:
+        if rows_in(core) < args.messages:
+            if rows_in(core):
+                print(f"{data_dir / DB_NAME} is incomplete; delete it and run again", file=sys.stderr)
+                return 1
+            print(f"Building {data_dir / DB_NAME} ({args.projects:,} projects, {args.messages:,} messages)...",
+                  file=sys.stderr, flush=True)
+            build_start: float = time.perf_counter()
+            generate(core.db, DatasetSpec(args.projects, args.messages, args.seed),
+                     lambda table, rows: print(f"  ... {rows:,} {table}", file=sys.stderr, flush=True))
+            print(f"  built in {time.perf_counter() - build_start:.1f} s", file=sys.stderr)
+
+        marks: Dict[str, int] = {table: core.db.query_one(f'SELECT IFNULL(MAX(id), 0) FROM {table}')[0]
+                                 for table in ("projects", "conversations", "tasks", "api_calls")}
+        bench_project: int = core.db.execute("INSERT INTO projects (title) VALUES ('Benchmark')")
+        rng: random.Random = random.Random(args.seed)
+
+        try:
+            for label, run in (
+                    ("history", lambda: bench_history(core, rng, args.projects, args.iterations)),
+                    ("stats", lambda: bench_stats(core, rng, args.projects, args.iterations)),
+                    ("writes", lambda: bench_writes(core, bench_project)),
+                    ("team discussion", lambda: bench_team(core, bench_project, args.runs))):
+                print(f"Benchmarking {label}...", file=sys.stderr, flush=True)
+                results.update(run())
+        finally:
+            clean_up(core, marks)
+    finally:
+        core.close()
+        fake.stop()
+
+    print("Benchmarking cold start...", file=sys.stderr, flush=True)
+    results.update(bench_cold_start(args.runs))
+
+    report: Dict[str, Any] = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "projects": args.projects,
+            "messages": args.messages,
+            "seed": args.seed,
+            "fake_api": {"latency_ms": args.latency_ms, "tokens_per_s": args.tokens_per_s,
+                         "reply_tokens": args.reply_tokens}
+        },
+        "results": results
+    }
+    text: str = json.dumps(report, indent=2)
+    if output:
+        output.write_text(text + "\n")
+    else:
+        print(text)
+
+    if baseline_path:
+        print(f"Compared with {baseline_path}:", file=sys.stderr)
+        baseline: Dict[str, Any] = json.loads(baseline_path.read_text())
+        if not compare(report, baseline, args.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,356 @@
+"""
+Synthetic data generator: projects, conversations, tasks and insights
+
+Bulk-loads the app's own database with realistic-looking data for benchmarks
+and load tests. The same seed always gives the same data. Conversations are
+chats with Spark or Proto plus some team discussions, spread over --days and
+skewed towards a few heavy projects. User turns are short and agent replies
+several times longer (both log-normal), and some Proto replies end with a
+block of numbered steps.
+
+    python benchmarks/synthetic.py --dir /tmp/trio-load --projects 1000 --messages 1000000
+    python benchmarks/synthetic.py --messages 5000000 --seed 7     # into the current directory
+    python benchmarks/synthetic.py --messages 1000000 --defer-indexes   # searchable after the app's next start
+
+Rows are inserted with Database.bulk_insert(), BATCH_ROWS per transaction,
+which does the work of the row triggers (full-text index, per-project
+counters) once per batch instead of per row. That is about 25,000 rows/s on
+one core, roughly half of it full-text indexing. --defer-indexes makes it
+about 60,000 rows/s. It builds the indexes once after the load, and it
+leaves full-text indexing of the new rows to the app's background backfill
+on its next start. Loading into a database that already has data appends to
+it.
+
+benchmarks/suite.py builds its databases with generate().
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from pathlib import Path
+from queue import Queue
+from threading import Thread
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+REPO_DIR: Path = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_DIR))
+
+from trio_core import (AGENTS, BACKFILLS, BULK_DERIVED, DB_NAME, TASK_AGENT, TASK_BLOCK_END,  # noqa: E402
+                       TASK_BLOCK_START, Database, TrioCore, estimate_tokens)
+
+BATCH_ROWS: int = 100000  # Rows per transaction
+CORPUS_WORDS: int = 200000  # Message text is cut from a corpus this long
+SEARCH_BACKFILLS: Dict[str, str] = {  # The backfill that full-text indexes each table's rows
+    "conversations": "conversations_fts",
+    "insights": "insights_fts"
+}
+
+WORDS: List[str] = ("idea step test ship why plan today tiny break focus start done file feature bug "
+                    "design user feel stuck energy next small win timer draft sketch email list notes "
+                    "refactor deploy review call budget page layout color api data login form cache "
+                    "again maybe later honestly excited bored tired proud quick messy clean").split()
+PROJECT_VERBS: List[str] = ["Build", "Learn", "Write", "Launch", "Redesign", "Finish", "Start", "Fix up"]
+PROJECT_THINGS: List[str] = ["a habit tracker", "Rust", "a short story", "my portfolio site", "the garden",
+                             "a podcast", "a budgeting app", "Spanish", "a board game", "the home lab",
+                             "a newsletter", "a chess bot", "a photo archive", "a recipe app"]
+PROJECT_STATUSES: Dict[str, int] = {"active": 70, "paused": 20, "completed": 10}
+STEP_MINUTES: List[int] = [2, 5, 5, 10, 10, 15, 25, 45, 90]
+
+class DatasetSpec(NamedTuple):
+    """Size and shape of a synthetic dataset"""
+    projects: int
+    messages: int
+    seed: int = 42
+    days: int = 365
+    tasks_per_project: int = 10
+    insights_per_project: int = 5
+    team_share: float = 0.1  # Fraction of exchanges that are team discussions
+
+
+class Generator:
+    """Deterministic row streams for one DatasetSpec
+
+    Project ids are only known once projects are inserted, so the other
+    streams take them as an argument.
+    """
+
+    def __init__(self, spec: DatasetSpec, now: Optional[float] = None) -> None:
+        self.spec: DatasetSpec = spec
+        self.rng: random.Random = random.Random(spec.seed)
+        self.corpus: str = " ".join(self.rng.choices(WORDS, k=CORPUS_WORDS))
+        self.end: float = now if now is not None else time.time()
+        self.start: float = self.end - spec.days * 86400
+
+    @staticmethod
+    def timestamp(seconds: float) -> str:
+        """SQLite CURRENT_TIMESTAMP format (UTC)"""
+        return time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(seconds))
+
+    def text(self, mu: float, sigma: float, limit: int) -> str:
+        """A slice of the corpus with a log-normal length in characters"""
+        length: int = max(2, min(limit, int(self.rng.lognormvariate(mu, sigma))))
+        # Start at a word boundary
+        offset: int = self.corpus.find(" ", self.rng.randrange(len(self.corpus) - length - 20)) + 1
+        return self.corpus[offset:offset + length].strip() or "ok"
+
+    def step(self, minutes: int) -> str:
+        """One task-like step with a time estimate"""
+        return f"{self.text(3.4, 0.4, 120).capitalize()} ({minutes} min)"
+
+    def pick_project(self, project_ids: Sequence[int]) -> int:
+        """A project id, skewed towards the first few (squaring favours low indexes)"""
+        return project_ids[int(len(project_ids) * self.rng.random() ** 2)]
+
+    def projects(self) -> Iterator[Tuple[Any, ...]]:
+        """(title, description, created_at, last_activity, status, initial_enthusiasm) rows
+
+        Projects are created during the first month before the conversations start.
+        """
+        statuses: List[str] = list(PROJECT_STATUSES)
+        weights: List[int] = list(PROJECT_STATUSES.values())
+        for n in range(1, self.spec.projects + 1):
+            created: str = self.timestamp(self.start - self.rng.uniform(0, 30 * 86400))
+            title: str = f"{self.rng.choice(PROJECT_VERBS)} {self.rng.choice(PROJECT_THINGS)} #{n}"
+            yield (title, self.text(4.5, 0.5, 400), created, created,
+                   self.rng.choices(statuses, weights)[0], self.rng.randint(4, 10))
+
+    def conversations(self, project_ids: Sequence[int]) -> Iterator[Tuple[Any, ...]]:
+        """(project_id, agent, message, timestamp, token_count) rows in time order
+
+        A welcome message per project, then exchanges: a user message and a
+        reply from one agent, or a [TEAM] message answered by every agent.
+        """
+        emitted: int = 0
+        for project_id in project_ids:
+            if emitted == self.spec.messages:
+                return
+            message: str = f"Welcome to project {project_id}. The trio is ready."
+            yield project_id, "system", message, self.timestamp(self.start), estimate_tokens(message)
+            emitted += 1
+
+        welcomes: int = emitted
+        total: int = max(self.spec.messages - welcomes, 1)
+        span: float = self.end - self.start
+        agents: List[str] = list(AGENTS)
+        while emitted < self.spec.messages:
+            project_id = self.pick_project(project_ids)
+            team: bool = self.rng.random() < self.spec.team_share
+            prefix: str = "[TEAM] " if team else ""
+            when: float = self.start + span * (emitted - welcomes) / total
+
+            turns: List[Tuple[str, str]] = [("user", prefix + self.text(4.3, 0.6, 2000))]
+            for agent in agents if team else [self.rng.choice(agents)]:
+                reply: str = self.text(6.3, 0.5, 6000)
+                if agent == TASK_AGENT and self.rng.random() < 0.3:
+                    steps: List[str] = [self.step(self.rng.choice(STEP_MINUTES))
+                                        for _ in range(self.rng.randint(1, 4))]
+                    numbered: str = "".join(f"\n{i}. {step}" for i, step in enumerate(steps, start=1))
+                    reply += f"\n{TASK_BLOCK_START}{numbered}\n{TASK_BLOCK_END}"
+                turns.append((agent, prefix + reply))
+
+            for agent, message in turns[:self.spec.messages - emitted]:
+                yield project_id, agent, message, self.timestamp(when), estimate_tokens(message)
+                emitted += 1
+                when += self.rng.uniform(5, 60)
+
+    def tasks(self, project_ids: Sequence[int]) -> Iterator[Tuple[Any, ...]]:
+        """(project_id, description, size, completed, completed_at, dopamine_score, created_at) rows
+
+        Sizes follow the time estimate as in extract_tasks(). About 60% are
+        done, most within a day or two, scored around 7 of 10.
+        """
+        count: int = len(project_ids) * self.spec.tasks_per_project
+        span: float = self.end - self.start
+        for i in range(count):
+            created: float = self.start + span * i / count
+            completed: bool = self.rng.random() < 0.6
+            done_at: Optional[str] = (self.timestamp(min(self.end, created + self.rng.expovariate(1 / 86400)))
+                                      if completed else None)
+            score: Optional[int] = round(self.rng.triangular(1, 10, 7)) if completed else None
+            minutes: int = self.rng.choice(STEP_MINUTES)
+            size: str = "tiny" if minutes <= 15 else "small" if minutes <= 60 else "large"
+            yield (self.pick_project(project_ids), self.step(minutes), size,
+                   int(completed), done_at, score, self.timestamp(created))
+
+    def insights(self, project_ids: Sequence[int]) -> Iterator[Tuple[Any, ...]]:
+        """(project_id, insight_type, content, timestamp) quick-capture rows"""
+        count: int = len(project_ids) * self.spec.insights_per_project
+        span: float = self.end - self.start
+        for i in range(count):
+            yield (self.pick_project(project_ids), "capture", self.text(4.0, 0.6, 500),
+                   self.timestamp(self.start + span * i / count))
+
+
+def batches(rows: Iterable[Tuple[Any, ...]], size: int) -> Iterator[List[Tuple[Any, ...]]]:
+    """Split a row stream into lists of at most size rows"""
+    batch: List[Tuple[Any, ...]] = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def prefetched(items: Iterator[Any], depth: int = 2) -> Iterator[Any]:
+    """Produce items on a background thread, depth ahead of the consumer
+
+    SQLite releases the GIL while it works, so the next batch is generated
+    while the current one is being inserted.
+    """
+    queue: Queue = Queue(maxsize=depth)
+    done: object = object()
+
+    def produce() -> None:
+        try:
+            for item in items:
+                queue.put(item)
+        except BaseException as exc:  # re-raised in the consumer
+            queue.put(exc)
+        queue.put(done)
+
+    Thread(target=produce, daemon=True).start()
+    while True:
+        item: Any = queue.get()
+        if item is done:
+            return
+        if isinstance(item, BaseException):
+            raise item
+        yield item
+
+
+def insert_rows(db: Database, table: str, columns: Sequence[str], rows: Iterable[Tuple[Any, ...]],
+                progress: Optional[Callable[[str, int], None]] = None,
+                derived: Optional[Sequence[str]] = None) -> Tuple[int, int]:
+    """Insert rows BATCH_ROWS per transaction with Database.bulk_insert()
+
+    derived is passed on to it. Returns the (first, last) id inserted, or
+    (0, -1) when there were no rows.
+    """
+    first_id: int = 0
+    last_id: int = -1
+    inserted: int = 0
+    for batch in prefetched(batches(rows, BATCH_ROWS)):
+        start, stop = db.bulk_insert(table, columns, batch, derived=derived)
+        first_id = first_id or start
+        last_id = stop
+        inserted += len(batch)
+        if progress:
+            progress(table, inserted)
+    return first_id, last_id
+
+
+def generate(db: Database, spec: DatasetSpec, progress: Optional[Callable[[str, int], None]] = None,
+             now: Optional[float] = None, defer_indexes: bool = False) -> Dict[str, int]:
+    """Append a synthetic dataset to a migrated database; returns rows inserted per table
+
+    progress, if given, is called with (table, rows so far) after each batch.
+    With defer_indexes, the loaded tables' indexes are dropped for the load
+    and built once at the end, and full-text indexing of the new rows is
+    left to the app, which does it in the background next time it starts;
+    until then search doesn't find them.
+    """
+    generator: Generator = Generator(spec, now)
+    first, last = insert_rows(db, "projects", ("title", "description", "created_at", "last_activity",
+                                               "status", "initial_enthusiasm"), generator.projects(), progress)
+    project_ids: List[int] = [row[0] for row in db.query(
+        'SELECT id FROM projects WHERE id BETWEEN ? AND ? ORDER BY id', (first, last))]
+    if not project_ids:
+        return {"projects": 0, "conversations": 0, "tasks": 0, "insights": 0}
+
+    counts: Dict[str, int] = {"projects": len(project_ids)}
+    loads: List[Tuple[str, Sequence[str], Iterator[Tuple[Any, ...]]]] = [
+        ("conversations", ("project_id", "agent", "message", "timestamp", "token_count"),
+         generator.conversations(project_ids)),
+        ("tasks", ("project_id", "description", "size", "completed", "completed_at", "dopamine_score",
+                   "created_at"), generator.tasks(project_ids)),
+        ("insights", ("project_id", "insight_type", "content", "timestamp"), generator.insights(project_ids))]
+    indexes: List[Tuple[Any, ...]] = []
+    if defer_indexes:
+        indexes = db.query(f'''
+            SELECT name, sql FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL
+              AND tbl_name IN ({", ".join("?" * len(loads))})
+        ''', tuple(table for table, _, _ in loads))
+        with db.transaction() as cursor:
+            for name, _ in indexes:
+                cursor.execute(f'DROP INDEX {name}')
+
+    try:
+        for table, columns, rows in loads:
+            search: Optional[str] = SEARCH_BACKFILLS.get(table) if defer_indexes else None
+            derived: Optional[List[str]] = None
+            if search:
+                derived = [sql for sql in BULK_DERIVED.get(table, []) if sql != BACKFILLS[search].sql]
+            start, stop = insert_rows(db, table, columns, rows, progress, derived)
+            counts[table] = stop - start + 1
+            if search and counts[table] and not db.defer_backfill(search, start, stop):
+                # The app is still indexing older rows; index these now rather than lose them
+                with db.transaction() as cursor:
+                    cursor.execute(BACKFILLS[search].sql, (start, stop))
+    finally:
+        with db.transaction() as cursor:
+            for _, sql in indexes:
+                cursor.execute(sql)
+
+    with db.transaction() as cursor:
+        cursor.execute('''
+            UPDATE projects SET last_activity = (
+                SELECT last_message_at FROM project_stats WHERE project_id = projects.id)
+            WHERE id BETWEEN ? AND ?
+              AND EXISTS (SELECT 1 FROM project_stats WHERE project_id = projects.id AND last_message_at IS NOT NULL)
+        ''', (first, last))
+    return counts
+
+
+def open_core(directory: Path) -> TrioCore:
+    """The app's core on the database in directory, schema created and migrated
+
+    Like the app, this uses (and creates) config.json and the database in
+    the working directory, so it changes into directory first.
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    os.chdir(directory)
+    core: TrioCore = TrioCore(warm_up=False)
+    core.init_database()
+    return core
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Generate a dataset into a directory's database"""
+    parser = argparse.ArgumentParser(description="Bulk-load synthetic projects, conversations, tasks and insights")
+    parser.add_argument("--dir", default=".", help=f"directory of the {DB_NAME} to fill (default: current)")
+    parser.add_argument("--projects", type=int, default=1000)
+    parser.add_argument("--messages", type=int, default=1000000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--days", type=int, default=365, help="time span the conversations cover")
+    parser.add_argument("--tasks-per-project", type=int, default=10)
+    parser.add_argument("--insights-per-project", type=int, default=5)
+    parser.add_argument("--team-share", type=float, default=0.1, help="fraction of exchanges that are team discussions")
+    parser.add_argument("--defer-indexes", action="store_true",
+                        help="build indexes once after the load, and leave full-text indexing to the app's next start")
+    args = parser.parse_args(argv)
+
+    spec: DatasetSpec = DatasetSpec(args.projects, args.messages, args.seed, args.days, args.tasks_per_project,
+                                    args.insights_per_project, args.team_share)
+    core: TrioCore = open_core(Path(args.dir).resolve())
+    started: float = time.perf_counter()
+
+    def report(table: str, rows: int) -> None:
+        print(f"  ... {table}: {rows:,} rows ({time.perf_counter() - started:.1f} s)", file=sys.stderr, flush=True)
+
+    try:
+        counts: Dict[str, int] = generate(core.db, spec, report, defer_indexes=args.defer_indexes)
+    finally:
+        core.close()
+    elapsed: float = time.perf_counter() - started
+    total: int = sum(counts.values())
+    print(f"Inserted {total:,} rows into {Path(DB_NAME).resolve()} in {elapsed:.1f} s "
+          f"({total / elapsed:,.0f} rows/s): " + ", ".join(f"{n:,} {table}" for table, n in counts.items()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,46 +4,100 @@ A three-way team productivity system with AI agents
 """
 
 import tkinter as tk
-from tkinter import ttk, scrolledtext, messagebox
-import anthropic
-import sqlite3
-import json
+from tkinter import ttk, scrolledtext, messagebox, filedialog
 import os
+import sqlite3
+import time
+import traceback
+from collections import deque
 from datetime import datetime
-from threading import Thread, Lock
+from functools import wraps
+from queue import Queue, Empty
+from threading import Thread, Lock, current_thread, main_thread
 from pathlib import Path
 import sys
-from typing import Dict, List, Optional, Tuple, Any
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple, Any, Callable
+
+if TYPE_CHECKING:
+    import cProfile
+
+from trio_core import (APP_NAME, APP_VERSION, CONTEXT_RECOVERY_PROMPT, METRICS_WINDOW_DAYS, PROFILE_ENV,
+                       PROFILE_FILE, SEARCH_MATCH_END, SEARCH_MATCH_START, TRACE_FILE, TRACER, RequestHandle,
+                       TrioCore, traced)
 
 # Constants
-APP_VERSION: str = "1.0.0"
-APP_NAME: str = "ADHD Productivity Trio"
-DB_NAME: str = "productivity_trio.db"
-CONFIG_FILE: str = "config.json"
+UI_FRAME_MS: int = 16  # Queued UI updates and streamed text are flushed once per frame
+UI_TICK_BUDGET_MS: float = 8.0  # Max time spent draining queued UI updates per frame
+HISTORY_PAGE_SIZE: int = 25  # Messages rendered per page of chat history
+HISTORY_MAX_LINES: int = 1500  # Chat panes evict offscreen messages beyond this many lines
+STATS_REFRESH_MS: int = 500  # Stats panel refreshes once writes have been quiet this long
+
+class UIDispatcher:
+    """Runs UI updates queued by worker threads on the Tk main loop
+
+    Tk widgets must only be touched from the thread running mainloop(). Workers
+    post callables here and a frame tick drains them in batches, stopping once
+    the per-tick budget is spent so the window stays responsive.
+    """
+
+    def __init__(self, root: tk.Tk, interval_ms: int = UI_FRAME_MS,
+                 budget_ms: float = UI_TICK_BUDGET_MS) -> None:
+        self.root: tk.Tk = root
+        self.interval_ms: int = interval_ms
+        self.budget_ms: float = budget_ms
+        self.queue: Queue = Queue()
+        self.tick_hooks: List[Callable[[], None]] = []
+
+    def post(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> None:
+        """Queue a call to run on the Tk thread (safe from any thread)"""
+        self.queue.put((func, args, kwargs))
+
+    def start(self) -> None:
+        """Start the drain loop (call from the Tk thread)"""
+        self.root.after(self.interval_ms, self.tick)
+
+    def tick(self) -> None:
+        """Drain queued updates within the frame budget, then run tick hooks"""
+        deadline: float = time.perf_counter() + self.budget_ms / 1000
+        while time.perf_counter() < deadline:
+            try:
+                func, args, kwargs = self.queue.get_nowait()
+            except Empty:
+                break
+            try:
+                func(*args, **kwargs)
+            except Exception:
+                traceback.print_exc()
+
+        for hook in self.tick_hooks:
+            try:
+                hook()
+            except Exception:
+                traceback.print_exc()
+
+        self.root.after(self.interval_ms, self.tick)
+
+def ui_thread(method: Callable[..., Any]) -> Callable[..., Any]:
+    """Run an app method on the Tk thread, queueing it when called from a worker"""
+    @wraps(method)
+    def wrapper(self: "ProductivityTrioApp", *args: Any, **kwargs: Any) -> None:
+        if current_thread() is main_thread():
+            method(self, *args, **kwargs)
+        else:
+            self.dispatcher.post(method, self, *args, **kwargs)
+    return wrapper
 
-class ProductivityTrioApp:
+class ProductivityTrioApp(TrioCore):
     def __init__(self, root: tk.Tk) -> None:
         self.root: tk.Tk = root
         self.root.title(f"{APP_NAME} v{APP_VERSION}")
         self.root.geometry("1400x900")
 
-        # Database attributes
-        self.conn: sqlite3.Connection
-        self.cursor: sqlite3.Cursor
-        self.db_lock: Lock
-
-        # Initialize database
-        self.init_database()
-
-        # Load configuration
-        self.config: Dict[str, Any] = self.load_config()
+        # Worker threads hand UI work to the Tk thread through this queue
+        self.dispatcher: UIDispatcher = UIDispatcher(root)
 
-        # Initialize Claude client
-        self.client: Optional[anthropic.Anthropic] = None
-        self.init_claude_client()
-
-        # Current project
-        self.current_project_id: Optional[int] = None
+        # Config, agents and the agent runtime; the slow parts wait for run_warm_up()
+        super().__init__(warm_up=False)
 
         # UI components
         self.project_title_label: ttk.Label
@@ -54,173 +108,61 @@ class ProductivityTrioApp:
         self.stats_label: ttk.Label
         self.insights_display: scrolledtext.ScrolledText
         self.status_bar: ttk.Label
+        self.team_rebuttal_var: tk.BooleanVar
+        self.trace_var: tk.BooleanVar
+        self.profile_var: tk.BooleanVar
+
+        # UI-thread profiler while View > Profile UI Thread is on
+        self.profiler: Optional["cProfile.Profile"] = None
+        self.profile_path: str = PROFILE_FILE
+
+        # Streamed replies waiting to be rendered, keyed by stream id
+        self.stream_lock: Lock = Lock()
+        self.streams: Dict[str, Dict[str, Any]] = {}
+        self.stream_counter: int = 0
+
+        # Chat panes mark the start of each rendered message with block<n>
+        self.block_counter: int = 0
+
+        # Pending debounced stats refresh, from root.after()
+        self.stats_refresh: Optional[str] = None
+
+        # Task id of each Active Tasks row, and the newest id listed so far
+        self.task_ids: List[int] = []
+        self.last_task_id: int = 0
+
+        # Widgets and (menu, label) items that need the schema, off until warm-up is done
+        self.startup_widgets: List[tk.Widget] = []
+        self.startup_menu_items: List[Tuple[tk.Menu, str]] = []
 
-        # Agent definitions
-        self.agents: Dict[str, Dict[str, str]] = {
-            "spark": {
-                "name": "Spark ✨",
-                "color": "#FF6B6B",
-                "role": "Motivator",
-                "system_prompt": """You are Spark, an ADHD-friendly motivational coach and emotional support agent.
-
-Your personality:
-- Warm, enthusiastic, but never overwhelming
-- Deeply understands ADHD patterns and challenges
-- Celebrates all wins, especially tiny ones
-- Non-judgmental about abandonment or restarts
-- Asks powerful "why" questions to capture meaning
-
-Your core responsibilities:
-1. Keep enthusiasm alive during projects
-2. Break overwhelming ideas into dopamine-generating micro-tasks
-3. Remind about the "why" behind projects (without guilt)
-4. Notice abandonment patterns early and gently check in
-5. Capture context and meaning before they vanish
-6. Create emotional safety for experimentation
-
-Communication style:
-- Short, energizing messages (ADHD-friendly)
-- Use emojis sparingly but meaningfully
-- Acknowledge feelings before suggesting actions
-- Frame challenges as adventures, not failures
-- End with hope and possibility
-
-Remember: You're not here to fix them. You're here to champion them."""
-            },
-            "proto": {
-                "name": "Proto 🎯",
-                "color": "#4ECDC4",
-                "role": "Executor",
-                "system_prompt": """You are Proto, a strategic executor and implementation specialist who understands ADHD.
-
-Your personality:
-- Pragmatic, clear, and action-oriented
-- Patient with context switching and restarts
-- Systematic but flexible
-- Tracks progress without judgment
-- Creates structure that supports, not constrains
-
-Your core responsibilities:
-1. Transform vague ideas into concrete, tiny actionable steps
-2. Create perfect "resume points" for when context switches happen
-3. Track what's been accomplished (celebrate progress)
-4. Suggest THE SINGLE most important next action
-5. Adapt plans when priorities or energy levels change
-6. Notice when someone is stuck and suggest alternatives
-
-Communication style:
-- Ultra-clear, numbered steps
-- One primary action at a time (avoid overwhelm)
-- Include time estimates (be realistic)
-- Provide "exit points" (places to pause guilt-free)
-- Use "we" language (you're on the team)
-- Always include "where we are" context
-
-Remember: Done is better than perfect. Momentum beats perfection."""
-            }
-        }
-        
         # Setup UI
         self.setup_ui()
-        
-        # Load or create initial project
-        self.load_initial_state()
-        
-    def init_database(self) -> None:
-        """Initialize SQLite database with schema"""
-        # Allow SQLite to be accessed from multiple threads
-        self.conn = sqlite3.connect(DB_NAME, check_same_thread=False)
-        self.cursor = self.conn.cursor()
-        # Create a lock for thread-safe database access
-        self.db_lock = Lock()
-        
-        # Projects table
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS projects (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                title TEXT NOT NULL,
-                description TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                last_activity TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                status TEXT DEFAULT 'active',
-                initial_enthusiasm INTEGER DEFAULT 10,
-                abandonment_count INTEGER DEFAULT 0
-            )
-        ''')
-        
-        # Conversations table
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS conversations (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                project_id INTEGER,
-                agent TEXT NOT NULL,
-                message TEXT NOT NULL,
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                context_snapshot TEXT,
-                FOREIGN KEY (project_id) REFERENCES projects (id)
-            )
-        ''')
-        
-        # Tasks table
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS tasks (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                project_id INTEGER,
-                description TEXT NOT NULL,
-                size TEXT DEFAULT 'tiny',
-                completed BOOLEAN DEFAULT 0,
-                completed_at TIMESTAMP,
-                dopamine_score INTEGER,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (project_id) REFERENCES projects (id)
-            )
-        ''')
-        
-        # Insights table
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS insights (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                project_id INTEGER,
-                insight_type TEXT NOT NULL,
-                content TEXT NOT NULL,
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (project_id) REFERENCES projects (id)
-            )
-        ''')
-        
-        self.conn.commit()
-        
-    def load_config(self) -> Dict[str, Any]:
-        """Load or create configuration"""
-        default_config: Dict[str, Any] = {
-            "anthropic_api_key": "",
-            "model": "claude-sonnet-4-5-20250929",
-            "max_tokens": 1024,
-            "theme": "light"
-        }
-        
-        if os.path.exists(CONFIG_FILE):
-            with open(CONFIG_FILE, 'r') as f:
-                return {**default_config, **json.load(f)}
-        else:
-            # Create default config
-            with open(CONFIG_FILE, 'w') as f:
-                json.dump(default_config, f, indent=2)
-            return default_config
-    
-    def save_config(self) -> None:
-        """Save configuration to file"""
-        with open(CONFIG_FILE, 'w') as f:
-            json.dump(self.config, f, indent=2)
-
-    def init_claude_client(self) -> None:
-        """Initialize Claude API client"""
-        api_key: str = self.config.get("anthropic_api_key", "")
-        if api_key and api_key != "":
-            try:
-                self.client = anthropic.Anthropic(api_key=api_key)
-            except Exception as e:
-                messagebox.showerror("API Error", f"Failed to initialize Claude client: {str(e)}")
+        self.enable_actions(False)
+        self.dispatcher.tick_hooks.append(self.flush_streams)
+        self.dispatcher.start()
+
+        # Opt-in profiling, e.g. TRIO_PROFILE=1 to write trio_profile.pstats on exit
+        profile_path: str = os.environ.get(PROFILE_ENV, "")
+        if profile_path:
+            self.profile_path = PROFILE_FILE if profile_path == "1" else profile_path
+            self.profile_var.set(True)
+            self.toggle_profiling()
+
+        # Schema checks, the SDK import and loading the project happen after
+        # the window is up
+        self.update_status("Starting up...")
+        Thread(target=self.run_warm_up, daemon=True).start()
+
+    def run_warm_up(self) -> None:
+        """Finish starting up in the background, then load or create the initial project"""
+        try:
+            self.warm_up()
+            project_id: Optional[int] = self.latest_project_id()
+        except Exception as e:
+            self.show_error("Startup Error", f"Could not open the database: {str(e)}")
+            self.update_status("Error - Could not start")
+            return
+        self.load_initial_state(project_id)
         
     def setup_ui(self) -> None:
         """Setup the main user interface"""
@@ -233,20 +175,40 @@ Remember: Done is better than perfect. Momentum beats perfection."""
         menubar.add_cascade(label="File", menu=file_menu)
         file_menu.add_command(label="New Project", command=self.create_new_project)
         file_menu.add_command(label="Settings", command=self.open_settings)
+        file_menu.add_command(label="Clear Response Cache", command=self.clear_response_cache)
+        file_menu.add_separator()
+        file_menu.add_command(label="Export Archive...", command=self.export_archive_to_file)
+        file_menu.add_command(label="Import Archive...", command=self.import_archive_from_file)
         file_menu.add_separator()
-        file_menu.add_command(label="Exit", command=self.root.quit)
+        file_menu.add_command(label="Exit", command=self.on_closing)
         
         # View menu
         view_menu = tk.Menu(menubar, tearoff=0)
         menubar.add_cascade(label="View", menu=view_menu)
         view_menu.add_command(label="All Projects", command=self.show_all_projects)
         view_menu.add_command(label="Insights", command=self.show_insights)
+        view_menu.add_command(label="Search...", command=self.show_search, accelerator="Ctrl+F")
+        view_menu.add_command(label="Performance", command=self.show_performance)
+        self.trace_var = tk.BooleanVar(value=TRACER.enabled)
+        view_menu.add_checkbutton(label="Record Trace", variable=self.trace_var, command=self.toggle_trace)
+        self.profile_var = tk.BooleanVar(value=False)
+        view_menu.add_checkbutton(label="Profile UI Thread", variable=self.profile_var,
+                                  command=self.toggle_profiling)
+        view_menu.add_separator()
+        view_menu.add_command(label="Fresh Context Recovery",
+                              command=lambda: self.context_recovery(bypass_cache=True))
         
         # Help menu
         help_menu = tk.Menu(menubar, tearoff=0)
         menubar.add_cascade(label="Help", menu=help_menu)
         help_menu.add_command(label="User Guide", command=self.show_user_guide)
         help_menu.add_command(label="About", command=self.show_about)
+
+        self.root.bind("<Control-f>", lambda e: self.show_search())
+        self.startup_menu_items += [(file_menu, label) for label in (
+            "New Project", "Clear Response Cache", "Export Archive...", "Import Archive...")]
+        self.startup_menu_items += [(view_menu, label) for label in (
+            "All Projects", "Insights", "Search...", "Performance", "Fresh Context Recovery")]
         
         # Main container
         main_container = ttk.PanedWindow(self.root, orient=tk.HORIZONTAL)
@@ -268,12 +230,12 @@ Remember: Done is better than perfect. Momentum beats perfection."""
         self.project_status_label.pack(anchor=tk.W)
         
         # Quick actions
-        ttk.Button(project_frame, text="🎯 Quick Capture", 
-                  command=self.quick_capture).pack(fill=tk.X, pady=2)
-        ttk.Button(project_frame, text="❓ What Was I Doing?", 
-                  command=self.context_recovery).pack(fill=tk.X, pady=2)
-        ttk.Button(project_frame, text="🎉 Complete Task", 
-                  command=self.complete_task).pack(fill=tk.X, pady=2)
+        for text, command in (("🎯 Quick Capture", self.quick_capture),
+                              ("❓ What Was I Doing?", self.context_recovery),
+                              ("🎉 Complete Task", self.complete_task)):
+            action_button = ttk.Button(project_frame, text=text, command=command)
+            action_button.pack(fill=tk.X, pady=2)
+            self.startup_widgets.append(action_button)
         
         # Tasks section
         tasks_frame = ttk.LabelFrame(left_panel, text="Active Tasks", padding=10)
@@ -323,16 +285,27 @@ Remember: Done is better than perfect. Momentum beats perfection."""
             send_button = ttk.Button(input_frame, text="Send", 
                                     command=lambda aid=agent_id: self.send_message(aid))
             send_button.pack(side=tk.RIGHT)
+
+            # Stop button, enabled while a reply is in flight
+            stop_button = ttk.Button(input_frame, text="⏹ Stop", state=tk.DISABLED,
+                                    command=lambda aid=agent_id: self.stop_requests(aid))
+            stop_button.pack(side=tk.RIGHT, padx=(0, 5))
             
             # Bind Enter key
             message_input.bind("<Return>", lambda e, aid=agent_id: self.send_message(aid))
+            self.startup_widgets += [message_input, send_button]
             
             self.agent_tabs[agent_id] = {
                 "frame": tab_frame,
                 "display": chat_display,
                 "input": message_input,
-                "button": send_button
+                "button": send_button,
+                "stop_button": stop_button,
+                **self.pane_state(paged=True)
             }
+
+            # Older history pages load when the pane is scrolled to the top
+            chat_display.config(yscrollcommand=lambda first, last, aid=agent_id: self.on_pane_scroll(aid, first, last))
         
         # Add a team discussion tab
         team_frame = ttk.Frame(self.notebook)
@@ -354,14 +327,21 @@ Remember: Done is better than perfect. Momentum beats perfection."""
         team_button = ttk.Button(team_input_frame, text="Ask Team", 
                                 command=self.ask_team)
         team_button.pack(side=tk.RIGHT)
+
+        # Optional follow-up round where Proto responds to Spark
+        self.team_rebuttal_var = tk.BooleanVar(value=self.config.get("team_rebuttal", False))
+        ttk.Checkbutton(team_input_frame, text="Proto follow-up",
+                        variable=self.team_rebuttal_var).pack(side=tk.RIGHT, padx=(0, 5))
         
         team_input.bind("<Return>", lambda e: self.ask_team())
+        self.startup_widgets += [team_input, team_button]
         
         self.agent_tabs["team"] = {
             "frame": team_frame,
             "display": team_display,
             "input": team_input,
-            "button": team_button
+            "button": team_button,
+            **self.pane_state(paged=False)
         }
         
         # Right panel - Stats and insights
@@ -388,6 +368,15 @@ Remember: Done is better than perfect. Momentum beats perfection."""
         self.status_bar = ttk.Label(self.root, text="Ready", relief=tk.SUNKEN, anchor=tk.W)
         self.status_bar.pack(side=tk.BOTTOM, fill=tk.X)
         
+    @ui_thread
+    def enable_actions(self, enabled: bool) -> None:
+        """Turn the actions that need the database and client on or off"""
+        state: str = tk.NORMAL if enabled else tk.DISABLED
+        for widget in self.startup_widgets:
+            widget.config(state=state)
+        for menu, label in self.startup_menu_items:
+            menu.entryconfig(label, state=state)
+
     def create_new_project(self) -> None:
         """Create a new project"""
         dialog: tk.Toplevel = tk.Toplevel(self.root)
@@ -430,43 +419,10 @@ Remember: Done is better than perfect. Momentum beats perfection."""
                 messagebox.showwarning("Validation", "Please enter a project title.")
                 return
 
-            with self.db_lock:
-                self.cursor.execute('''
-                    INSERT INTO projects (title, description, initial_enthusiasm)
-                    VALUES (?, ?, ?)
-                ''', (title, description, enthusiasm))
-                self.conn.commit()
-
-                project_id = self.cursor.lastrowid
-                self.current_project_id = project_id
-            
-            # Add initial conversation with both agents
-            welcome_msg = f"New project started: {title}"
-            self.save_conversation(project_id, "system", welcome_msg)
-            
-            # Send intro to Spark
-            spark_intro = f"""A new project has started! 
-
-Title: {title}
-Description: {description}
-Initial enthusiasm: {enthusiasm}/10
-
-Say hello and help capture the excitement and 'why' behind this project!"""
-            
-            self.send_to_agent("spark", spark_intro, auto=True)
-            
-            # Send intro to Proto
-            proto_intro = f"""New project initiated:
-
-Title: {title}
-Description: {description}
-
-Help break this down into the first tiny actionable steps."""
-            
-            self.send_to_agent("proto", proto_intro, auto=True)
-            
-            self.load_project_info()
-            self.update_stats()
+            # Saves it and sends the intros to both agents
+            self.leave_project()
+            self.create_project(title, description, enthusiasm)
+            self.show_project()
             dialog.destroy()
             
             messagebox.showinfo("Success", f"Project '{title}' created! Your agents are ready to help.")
@@ -483,6 +439,10 @@ Help break this down into the first tiny actionable steps."""
             messagebox.showwarning("No Project", "Please create or select a project first.")
             return
 
+        if not self.ready.is_set():
+            self.update_status("Still starting up...")
+            return
+
         if not self.client:
             messagebox.showerror("API Error", "Claude API client not initialized. Please check your API key in settings.")
             return
@@ -497,68 +457,25 @@ Help break this down into the first tiny actionable steps."""
         # Display user message
         self.display_message(agent_id, "You", message, "user")
         
-        # Save to database
-        self.save_conversation(self.current_project_id, "user", message)
-        
-        # Update last activity
-        self.update_project_activity()
-        
-        # Send to Claude in background thread
-        Thread(target=self.send_to_agent, args=(agent_id, message), daemon=True).start()
-    
-    def send_to_agent(self, agent_id: str, message: str, auto: bool = False) -> None:
-        """Send message to agent and get response"""
-        try:
-            # Get agent info
-            agent: Dict[str, str] = self.agents[agent_id]
-
-            # Get conversation history for context
-            history: List[Tuple[Any, ...]] = self.get_conversation_history(self.current_project_id, agent_id, limit=10)
-            
-            # Build messages array
-            messages: List[Dict[str, str]] = []
-            for msg in history:
-                role: str = "user" if msg[1] == "user" else "assistant"
-                messages.append({"role": role, "content": msg[2]})
-            
-            # Add current message
-            messages.append({"role": "user", "content": message})
-            
-            # Update status
-            self.update_status(f"Asking {agent['name']}...")
-            
-            # Call Claude API
-            response = self.client.messages.create(
-                model=self.config["model"],
-                max_tokens=self.config["max_tokens"],
-                system=agent["system_prompt"],
-                messages=messages
-            )
-            
-            # Extract response text
-            response_text: str = response.content[0].text
-            
-            # Display agent response
-            if not auto:
-                self.display_message(agent_id, agent["name"], response_text, "agent")
-            
-            # Save to database
-            self.save_conversation(self.current_project_id, agent_id, response_text)
-            
-            # Update status
-            self.update_status("Ready")
-            
-        except Exception as e:
-            error_msg: str = f"Error communicating with {agent['name']}: {str(e)}"
-            messagebox.showerror("API Error", error_msg)
-            self.update_status("Error - Check your API key")
+        # Save it and send to Claude on the agent runtime
+        handle: RequestHandle = self.start_request(agent_id)
+        handle.attach(self.runtime.submit(self.chat(self.current_project_id, agent_id, message, handle=handle)))
 
+    @ui_thread
+    def set_busy(self, agent_id: str, busy: bool) -> None:
+        """Enable an agent tab's Stop button while it has requests in flight"""
+        self.agent_tabs[agent_id]["stop_button"].config(state=tk.NORMAL if busy else tk.DISABLED)
+    
     def ask_team(self) -> None:
         """Send message to both agents for team discussion"""
         if not self.current_project_id:
             messagebox.showwarning("No Project", "Please create or select a project first.")
             return
         
+        if not self.ready.is_set():
+            self.update_status("Still starting up...")
+            return
+
         if not self.client:
             messagebox.showerror("API Error", "Claude API client not initialized.")
             return
@@ -573,62 +490,309 @@ Help break this down into the first tiny actionable steps."""
         # Display user message in team chat
         self.display_message("team", "You", message, "user")
 
-        # Save to database
-        self.save_conversation(self.current_project_id, "user", f"[TEAM] {message}")
-
-        # Ask both agents in sequence
-        Thread(target=self.team_discussion, args=(message,), daemon=True).start()
-
-    def team_discussion(self, message: str) -> None:
-        """Facilitate team discussion between agents"""
-        try:
-            # Ask Spark first
-            self.update_status("Asking Spark...")
-            spark_response: str = self.get_agent_response("spark",
-                f"In a team discussion, the user asked: {message}\n\nProvide your perspective as the Motivator.")
-
-            self.display_message("team", "Spark ✨", spark_response, "spark")
-            self.save_conversation(self.current_project_id, "spark", f"[TEAM] {spark_response}")
-
-            # Then ask Proto
-            self.update_status("Asking Proto...")
-            proto_response: str = self.get_agent_response("proto", 
-                f"In a team discussion, the user asked: {message}\n\nSpark's perspective: {spark_response}\n\nProvide your perspective as the Executor.")
-            
-            self.display_message("team", "Proto 🎯", proto_response, "proto")
-            self.save_conversation(self.current_project_id, "proto", f"[TEAM] {proto_response}")
-            
-            self.update_status("Ready")
-            
-        except Exception as e:
-            messagebox.showerror("Error", f"Team discussion error: {str(e)}")
-            self.update_status("Error")
-
-    def get_agent_response(self, agent_id: str, message: str) -> str:
-        """Get response from agent (helper method)"""
-        agent: Dict[str, str] = self.agents[agent_id]
-        
-        response = self.client.messages.create(
-            model=self.config["model"],
-            max_tokens=self.config["max_tokens"],
-            system=agent["system_prompt"],
-            messages=[{"role": "user", "content": message}]
-        )
-        
-        return response.content[0].text
+        # Save it and ask both agents concurrently
+        rebuttal: bool = self.team_rebuttal_var.get()
+        self.runtime.submit(self.team_discussion(self.current_project_id, message, rebuttal))
+
+    def begin_stream(self, display_id: str, sender: str, tag: str) -> str:
+        """Reserve a message block in a chat pane for a streamed reply"""
+        with self.stream_lock:
+            self.stream_counter += 1
+            stream_id: str = f"stream{self.stream_counter}"
+            self.streams[stream_id] = {
+                "display_id": display_id,
+                "sender": sender,
+                "tag": tag,
+                "chunks": [],
+                "started": False,
+                "reset": False,
+                "done": False
+            }
+        return stream_id
+
+    def reset_stream(self, stream_id: str) -> None:
+        """Discard a streamed reply's text so far (safe to call from worker threads)"""
+        with self.stream_lock:
+            stream: Optional[Dict[str, Any]] = self.streams.get(stream_id)
+            if stream is not None:
+                stream["chunks"].clear()
+                stream["reset"] = stream["started"]
+
+    def append_stream(self, stream_id: str, text: str) -> None:
+        """Queue a streamed text delta (safe to call from worker threads)"""
+        with self.stream_lock:
+            if stream_id in self.streams:
+                self.streams[stream_id]["chunks"].append(text)
+
+    def end_stream(self, stream_id: str) -> None:
+        """Mark a streamed reply as finished"""
+        with self.stream_lock:
+            if stream_id in self.streams:
+                self.streams[stream_id]["done"] = True
+
+    def discard_streams(self, display_id: str) -> None:
+        """Forget a pane's streamed replies, e.g. when its history is replaced"""
+        display: scrolledtext.ScrolledText = self.agent_tabs[display_id]["display"]
+        with self.stream_lock:
+            for stream_id, stream in list(self.streams.items()):
+                if stream["display_id"] == display_id:
+                    del self.streams[stream_id]
+                    display.mark_unset(stream_id, f"{stream_id}.start")
+
+    def pane_streaming(self, display_id: str) -> bool:
+        """Whether a streamed reply is being rendered into a pane"""
+        with self.stream_lock:
+            return any(stream["display_id"] == display_id for stream in self.streams.values())
+
+    @traced("ui")
+    def flush_streams(self) -> None:
+        """Render queued stream deltas, one coalesced insert per stream per frame
+
+        Runs as a dispatcher tick hook on the Tk thread.
+        """
+        with self.stream_lock:
+            pending: List[Tuple[str, Dict[str, Any], str, bool]] = []
+            for stream_id, stream in list(self.streams.items()):
+                pending.append((stream_id, stream, "".join(stream["chunks"]), stream["reset"]))
+                stream["chunks"].clear()
+                stream["reset"] = False
+                stream["started"] = True
+                if stream["done"]:
+                    del self.streams[stream_id]
+
+        for stream_id, stream, text, reset in pending:
+            tab: Dict[str, Any] = self.agent_tabs[stream["display_id"]]
+            display: scrolledtext.ScrolledText = tab["display"]
+            start_mark: str = f"{stream_id}.start"
+
+            if start_mark not in display.mark_names() and tab["detached"]:
+                # The newest messages were evicted; bring them back before appending
+                self.load_history(stream["display_id"])
+            display.config(state=tk.NORMAL)
+
+            if start_mark not in display.mark_names():
+                # Header plus an empty block; the stream mark tracks where deltas
+                # go and the left-gravity start mark stays at the block's start
+                start: str = display.index("end-1c")
+                timestamp: str = datetime.now().strftime("%H:%M")
+                display.insert(tk.END, f"{stream['sender']} ({timestamp})\n", stream["tag"])
+                self.add_block(stream["display_id"], start, None)
+                display.insert(tk.END, "\n\n")
+                display.mark_set(stream_id, "end-3c")
+                display.mark_set(start_mark, "end-3c")
+                display.mark_gravity(start_mark, tk.LEFT)
+
+            if reset:
+                display.delete(start_mark, stream_id)
+            if text:
+                display.insert(stream_id, text)
+            if stream["done"]:
+                display.mark_unset(stream_id, start_mark)
+
+            self.enforce_line_cap(stream["display_id"])
+            display.see(tk.END)
+            display.config(state=tk.DISABLED)
     
+    @ui_thread
+    @traced("ui")
     def display_message(self, agent_id: str, sender: str, message: str, tag: str) -> None:
         """Display message in chat window"""
-        display: scrolledtext.ScrolledText = self.agent_tabs[agent_id]["display"]
+        tab: Dict[str, Any] = self.agent_tabs[agent_id]
+        display: scrolledtext.ScrolledText = tab["display"]
+        if tab["detached"] and not self.pane_streaming(agent_id):
+            # The newest messages were evicted; bring them back before appending
+            self.load_history(agent_id)
         display.config(state=tk.NORMAL)
 
+        start: str = display.index("end-1c")
         timestamp: str = datetime.now().strftime("%H:%M")
         display.insert(tk.END, f"{sender} ({timestamp})\n", tag)
         display.insert(tk.END, f"{message}\n\n")
+        self.add_block(agent_id, start, None)
+
+        self.enforce_line_cap(agent_id)
+        display.see(tk.END)
+        display.config(state=tk.DISABLED)
+
+    def pane_state(self, paged: bool) -> Dict[str, Any]:
+        """Initial history-paging state for a chat pane
+
+        blocks holds a (mark, row id) pair per rendered message, oldest
+        first; the row id is None for messages shown live this session.
+        Paged panes render an agent's saved history a page at a time.
+        """
+        return {
+            "paged": paged,
+            "blocks": deque(),
+            "oldest_id": None,  # id of the oldest rendered row; older pages come before it
+            "has_older": False,
+            "detached": False,  # the newest messages were evicted to load older ones
+            "loading": False,
+            "generation": 0  # bumped on reload so stale page fetches are ignored
+        }
+
+    def add_block(self, display_id: str, start: str, row_id: Optional[int], at_top: bool = False) -> None:
+        """Mark the start of a newly rendered message in a pane"""
+        tab: Dict[str, Any] = self.agent_tabs[display_id]
+        self.block_counter += 1
+        mark: str = f"block{self.block_counter}"
+        tab["display"].mark_set(mark, start)
+        if at_top:
+            tab["blocks"].appendleft((mark, row_id))
+        else:
+            tab["blocks"].append((mark, row_id))
+
+    def render_history_rows(self, agent_id: str, rows: List[Tuple[Any, ...]], at_top: bool) -> None:
+        """Insert history rows (oldest first) at the end of a pane, or before its first message"""
+        display: scrolledtext.ScrolledText = self.agent_tabs[agent_id]["display"]
+        if at_top:
+            # Inserting at this mark moves it along, so the rows stay in order
+            display.mark_set("history.insert", "1.0")
+        index: str = "history.insert" if at_top else tk.END
+        marks: List[Tuple[str, int]] = []
+
+        for timestamp, agent, message, row_id, _ in rows:
+            start: str = display.index("history.insert" if at_top else "end-1c")
+            sender: str = "You" if agent == "user" else self.agents[agent]["name"]
+            time_str: str = datetime.fromisoformat(timestamp).strftime("%m/%d %H:%M")
+            display.insert(index, f"{sender} ({time_str})\n", "user" if agent == "user" else "agent")
+            display.insert(index, f"{message}\n\n")
+            marks.append((start, row_id))
+
+        # Blocks are added oldest first, so prepend them newest first
+        for start, row_id in (reversed(marks) if at_top else marks):
+            self.add_block(agent_id, start, row_id, at_top=at_top)
+        if at_top:
+            display.mark_unset("history.insert")
+
+    @traced("ui")
+    def load_history(self, agent_id: str) -> None:
+        """Replace a pane's contents with the newest page of the current project's history"""
+        tab: Dict[str, Any] = self.agent_tabs[agent_id]
+        display: scrolledtext.ScrolledText = tab["display"]
+        tab["generation"] += 1
+
+        rows: List[Tuple[Any, ...]] = []
+        if self.current_project_id and tab["paged"]:
+            rows = self.get_conversation_history(self.current_project_id, agent_id, limit=HISTORY_PAGE_SIZE)
+
+        display.config(state=tk.NORMAL)
+        display.delete("1.0", tk.END)
+        for mark, _ in tab["blocks"]:
+            display.mark_unset(mark)
+        tab["blocks"].clear()
+
+        self.render_history_rows(agent_id, rows, at_top=False)
+        tab["oldest_id"] = rows[0][3] if rows else None
+        tab["has_older"] = len(rows) == HISTORY_PAGE_SIZE
+        tab["detached"] = False
+        tab["loading"] = False
 
         display.see(tk.END)
         display.config(state=tk.DISABLED)
 
+    def load_older_history(self, agent_id: str) -> None:
+        """Fetch the page before a pane's oldest message in the background"""
+        tab: Dict[str, Any] = self.agent_tabs[agent_id]
+        tab["loading"] = True
+        project_id: Optional[int] = self.current_project_id
+        generation: int = tab["generation"]
+        before_id: int = tab["oldest_id"]
+
+        def fetch() -> None:
+            rows: Optional[List[Tuple[Any, ...]]] = None
+            try:
+                rows = self.get_conversation_history(project_id, agent_id, limit=HISTORY_PAGE_SIZE,
+                                                     before_id=before_id)
+            except Exception:
+                traceback.print_exc()
+            self.render_older_history(agent_id, generation, rows)
+
+        Thread(target=fetch, daemon=True).start()
+
+    @ui_thread
+    @traced("ui")
+    def render_older_history(self, agent_id: str, generation: int,
+                             rows: Optional[List[Tuple[Any, ...]]]) -> None:
+        """Prepend a fetched page of older history, keeping the visible text in place"""
+        tab: Dict[str, Any] = self.agent_tabs[agent_id]
+        if generation != tab["generation"]:
+            return  # The pane was reloaded meanwhile
+        tab["loading"] = False
+        if rows is None:
+            return
+        if not rows:
+            tab["has_older"] = False
+            return
+
+        display: scrolledtext.ScrolledText = tab["display"]
+        display.config(state=tk.NORMAL)
+        top_line: int = int(display.index("@0,0").split(".")[0])
+        line_count: int = int(display.index("end-1c").split(".")[0])
+
+        self.render_history_rows(agent_id, rows, at_top=True)
+        tab["oldest_id"] = rows[0][3]
+        tab["has_older"] = len(rows) == HISTORY_PAGE_SIZE
+
+        added: int = int(display.index("end-1c").split(".")[0]) - line_count
+        display.yview(f"{top_line + added}.0")
+        self.enforce_line_cap(agent_id)
+        display.config(state=tk.DISABLED)
+
+    def on_pane_scroll(self, agent_id: str, first: str, last: str) -> None:
+        """Scrollbar callback: page in older history at the top, newer at the bottom"""
+        tab: Dict[str, Any] = self.agent_tabs[agent_id]
+        tab["display"].vbar.set(first, last)
+        if tab["loading"]:
+            return
+        if float(first) <= 0.0 and tab["has_older"]:
+            if tab["oldest_id"] is not None:
+                tab["loading"] = True
+                self.root.after_idle(self.load_older_history, agent_id)
+            elif not self.pane_streaming(agent_id):
+                tab["loading"] = True
+                self.root.after_idle(self.load_history, agent_id)
+        elif float(last) >= 1.0 and tab["detached"] and not self.pane_streaming(agent_id):
+            tab["loading"] = True
+            self.root.after_idle(self.load_history, agent_id)
+
+    @traced("ui")
+    def enforce_line_cap(self, display_id: str) -> None:
+        """Evict whole messages from the end of a pane away from the view once it passes HISTORY_MAX_LINES
+
+        Evicted history can be paged back in. Messages shown live this
+        session have no row id to page from, so once one goes from the
+        top, scrolling back up reloads the pane from the database instead.
+        """
+        tab: Dict[str, Any] = self.agent_tabs[display_id]
+        display: scrolledtext.ScrolledText = tab["display"]
+        blocks: deque = tab["blocks"]
+
+        def line_count() -> int:
+            return int(display.index("end-1c").split(".")[0])
+
+        if line_count() <= HISTORY_MAX_LINES:
+            return
+
+        first, last = display.yview()
+        if first + last >= 1.0:
+            # Looking at the newer half: drop the oldest messages
+            while line_count() > HISTORY_MAX_LINES and len(blocks) > 1:
+                mark, _ = blocks.popleft()
+                display.delete("1.0", blocks[0][0])
+                display.mark_unset(mark)
+                if tab["paged"]:
+                    # None once only live messages are left
+                    tab["oldest_id"] = blocks[0][1]
+                    tab["has_older"] = True
+        else:
+            # Reading older history: drop the newest saved messages until scrolled back down
+            while line_count() > HISTORY_MAX_LINES and len(blocks) > 1 and blocks[-1][1] is not None:
+                mark, _ = blocks.pop()
+                display.delete(mark, "end-1c")
+                display.mark_unset(mark)
+                tab["detached"] = True
+
     def quick_capture(self) -> None:
         """Quick capture current state"""
         if not self.current_project_id:
@@ -651,16 +815,8 @@ Help break this down into the first tiny actionable steps."""
         def save_capture() -> None:
             content: str = capture_text.get("1.0", tk.END).strip()
             if content:
-                # Save as insight
-                with self.db_lock:
-                    self.cursor.execute('''
-                        INSERT INTO insights (project_id, insight_type, content)
-                        VALUES (?, ?, ?)
-                    ''', (self.current_project_id, "capture", content))
-                    self.conn.commit()
-
-                # Send to Spark for processing
-                self.send_to_agent("spark", f"Quick capture: {content}", auto=True)
+                # Save as insight and send to Spark for processing
+                self.add_capture(content)
 
                 self.update_insights_display()
                 messagebox.showinfo("Saved", "Your thoughts have been captured!")
@@ -668,16 +824,19 @@ Help break this down into the first tiny actionable steps."""
 
         ttk.Button(dialog, text="Capture", command=save_capture).pack(pady=10)
 
-    def context_recovery(self) -> None:
+    def context_recovery(self, bypass_cache: bool = False) -> None:
         """Help recover context when returning to project"""
         if not self.current_project_id:
             messagebox.showwarning("No Project", "Please create or select a project first.")
             return
         
-        # Ask Proto for a summary
-        self.send_to_agent("proto", 
-            "I'm returning to this project. Can you give me a quick summary of where we are and what the single most important next action is?",
-            auto=False)
+        # Ask Proto for a summary; it streams into Proto's tab, so Stop and
+        # latest-wins treat it like a chat there
+        handle: RequestHandle = self.start_request("proto")
+        handle.attach(self.runtime.submit(self.send_to_agent(self.current_project_id, "proto",
+                                                             CONTEXT_RECOVERY_PROMPT, cacheable=True,
+                                                             bypass_cache=bypass_cache, handle=handle,
+                                                             call_site="recovery")))
         
         self.notebook.select(1)  # Switch to Proto's tab
 
@@ -688,6 +847,7 @@ Help break this down into the first tiny actionable steps."""
             messagebox.showinfo("No Selection", "Please select a task to complete.")
             return
 
+        task_id: int = self.task_ids[selection[0]]
         task_text: str = self.tasks_listbox.get(selection[0])
         
         # Simple dopamine celebration
@@ -719,52 +879,41 @@ Help break this down into the first tiny actionable steps."""
 
         def save_completion() -> None:
             score: int = int(dopamine_var.get())
-            # Here you would update the task in database
-            # For MVP, just remove from list
+            self.record_task_completion(task_id, score)
+
+            # New tasks are only ever appended, so the row hasn't moved
             self.tasks_listbox.delete(selection[0])
+            del self.task_ids[selection[0]]
             
             # Notify Spark
-            self.send_to_agent("spark", 
+            self.runtime.submit(self.send_to_agent(self.current_project_id, "spark",
                 f"I just completed a task: {task_text}. Dopamine score: {score}/10. Celebrate with me!",
-                auto=True)
+                True, call_site="completion"))
             
             dialog.destroy()
         
         ttk.Button(dialog, text="Save", command=save_completion).pack(pady=15)
 
-    def save_conversation(self, project_id: Optional[int], agent: str, message: str) -> None:
-        """Save conversation to database"""
-        with self.db_lock:
-            self.cursor.execute('''
-                INSERT INTO conversations (project_id, agent, message)
-                VALUES (?, ?, ?)
-            ''', (project_id, agent, message))
-            self.conn.commit()
-
-    def get_conversation_history(self, project_id: Optional[int], agent_id: str, limit: int = 10) -> List[Tuple[Any, ...]]:
-        """Get conversation history"""
-        with self.db_lock:
-            self.cursor.execute('''
-                SELECT timestamp, agent, message
-                FROM conversations
-                WHERE project_id = ? AND (agent = ? OR agent = 'user')
-                ORDER BY timestamp DESC
-                LIMIT ?
-            ''', (project_id, agent_id, limit))
-
-            return list(reversed(self.cursor.fetchall()))
-
-    def update_project_activity(self) -> None:
-        """Update last activity timestamp"""
-        if self.current_project_id:
-            with self.db_lock:
-                self.cursor.execute('''
-                    UPDATE projects
-                    SET last_activity = CURRENT_TIMESTAMP
-                    WHERE id = ?
-                ''', (self.current_project_id,))
-                self.conn.commit()
+    def load_tasks(self) -> None:
+        """Fill Active Tasks with the current project's open tasks"""
+        self.tasks_listbox.delete(0, tk.END)
+        self.task_ids.clear()
+        self.last_task_id = 0
+        self.tasks_changed()
+
+    @ui_thread
+    @traced("ui")
+    def tasks_changed(self) -> None:
+        """Append tasks saved since the list was last updated"""
+        if not self.current_project_id:
+            return
+        rows: List[Tuple[Any, ...]] = self.get_open_tasks(self.current_project_id, after_id=self.last_task_id)
+        if rows:
+            self.tasks_listbox.insert(tk.END, *(f"[{size}] {description}" for _, description, size in rows))
+            self.task_ids.extend(task_id for task_id, _, _ in rows)
+            self.last_task_id = rows[-1][0]
 
+    @traced("ui")
     def load_project_info(self) -> None:
         """Load and display current project info"""
         if not self.current_project_id:
@@ -772,14 +921,11 @@ Help break this down into the first tiny actionable steps."""
             self.project_status_label.config(text="")
             return
 
-        with self.db_lock:
-            self.cursor.execute('''
-                SELECT title, created_at, last_activity, status
-                FROM projects
-                WHERE id = ?
-            ''', (self.current_project_id,))
-
-            result: Optional[Tuple[Any, ...]] = self.cursor.fetchone()
+        result: Optional[Tuple[Any, ...]] = self.db.query_one('''
+            SELECT title, created_at, last_activity, status
+            FROM projects
+            WHERE id = ?
+        ''', (self.current_project_id,))
 
         if result:
             title: str
@@ -790,51 +936,59 @@ Help break this down into the first tiny actionable steps."""
             self.project_title_label.config(text=title)
             self.project_status_label.config(text=f"Status: {status.title()}")
 
+    @traced("ui")
     def update_stats(self) -> None:
         """Update statistics display"""
         if not self.current_project_id:
             return
 
-        with self.db_lock:
-            # Get project count
-            self.cursor.execute('SELECT COUNT(*) FROM projects')
-            project_count: int = self.cursor.fetchone()[0]
+        stats: Dict[str, Any] = self.get_project_stats(self.current_project_id)
+        completion: str = (f"{stats['completion_rate']:.0%}" if stats["completion_rate"] is not None
+                           else "no tasks yet")
 
-            # Get message count for current project
-            self.cursor.execute('''
-                SELECT COUNT(*) FROM conversations WHERE project_id = ?
-            ''', (self.current_project_id,))
-            message_count: int = self.cursor.fetchone()[0]
+        with self.usage_lock:
+            cache_read: int = self.usage_totals["cache_read_input_tokens"]
+            cache_written: int = self.usage_totals["cache_creation_input_tokens"]
+            uncached: int = self.usage_totals["input_tokens"]
 
-            # Get task count
-            self.cursor.execute('''
-                SELECT COUNT(*) FROM tasks WHERE project_id = ? AND completed = 0
-            ''', (self.current_project_id,))
-            task_count: int = self.cursor.fetchone()[0]
+        stats_text: str = f"""Total Projects: {stats['project_count']}
+Messages: {stats['message_count']} ({stats['messages_per_day']:.1f}/day)
+Active Tasks: {stats['open_task_count']}
+Completion: {completion}
 
-        stats_text: str = f"""Total Projects: {project_count}
-Messages: {message_count}
-Active Tasks: {task_count}
+Prompt cache (this session):
+  {cache_read} tokens read, {cache_written} written, {uncached} uncached
 
 Team formed: {datetime.now().strftime('%Y-%m-%d')}
 """
 
         self.stats_label.config(text=stats_text)
 
+    @ui_thread
+    def stats_changed(self) -> None:
+        """Refresh the stats panel once a burst of writes has settled"""
+        if self.stats_refresh is not None:
+            self.root.after_cancel(self.stats_refresh)
+        self.stats_refresh = self.root.after(STATS_REFRESH_MS, self.refresh_stats)
+
+    def refresh_stats(self) -> None:
+        """Debounced update_stats, scheduled by stats_changed"""
+        self.stats_refresh = None
+        self.update_stats()
+
+    @traced("ui")
     def update_insights_display(self) -> None:
         """Update insights display"""
         self.insights_display.config(state=tk.NORMAL)
         self.insights_display.delete("1.0", tk.END)
 
         if self.current_project_id:
-            with self.db_lock:
-                self.cursor.execute('''
-                    SELECT content, timestamp FROM insights
-                    WHERE project_id = ?
-                    ORDER BY timestamp DESC LIMIT 5
-                ''', (self.current_project_id,))
-
-                insights: List[Tuple[str, str]] = self.cursor.fetchall()
+            self.db.flush()
+            insights: List[Tuple[Any, ...]] = self.db.query('''
+                SELECT content, timestamp FROM insights
+                WHERE project_id = ?
+                ORDER BY timestamp DESC LIMIT 5
+            ''', (self.current_project_id,))
 
             for content, timestamp in insights:
                 time_str: str = datetime.fromisoformat(timestamp).strftime("%m/%d %H:%M")
@@ -842,23 +996,26 @@ Team formed: {datetime.now().strftime('%Y-%m-%d')}
 
         self.insights_display.config(state=tk.DISABLED)
 
+    @ui_thread
+    @traced("ui")
     def update_status(self, message: str) -> None:
         """Update status bar"""
         self.status_bar.config(text=message)
         self.root.update_idletasks()
 
-    def load_initial_state(self) -> None:
-        """Load initial state on app start"""
-        # Check if there are any projects
-        with self.db_lock:
-            self.cursor.execute('SELECT id FROM projects ORDER BY last_activity DESC LIMIT 1')
-            result: Optional[Tuple[int]] = self.cursor.fetchone()
+    @ui_thread
+    def show_error(self, title: str, message: str) -> None:
+        """Show an error dialog"""
+        messagebox.showerror(title, message)
 
-        if result:
-            self.current_project_id = result[0]
-            self.load_project_info()
-            self.update_stats()
-            self.update_insights_display()
+    @ui_thread
+    def load_initial_state(self, project_id: Optional[int]) -> None:
+        """Show the most recently active project, or welcome a new user"""
+        self.update_status("Ready")
+        self.enable_actions(True)
+
+        if project_id:
+            self.open_project(project_id)
         else:
             # Welcome message
             if self.client:
@@ -868,6 +1025,28 @@ Team formed: {datetime.now().strftime('%Y-%m-%d')}
                     "✨ Spark (Motivator) and 🎯 Proto (Executor)\n\n" +
                     "Together, the three of you will build something amazing!")
 
+    def open_project(self, project_id: int) -> None:
+        """Switch to a project and show its newest history"""
+        self.leave_project()
+        self.current_project_id = project_id
+        self.show_project()
+
+    def leave_project(self) -> None:
+        """Stop the current project's replies before switching away from it"""
+        for display_id in self.agent_tabs:
+            if display_id in self.agents:
+                self.stop_requests(display_id)
+            self.discard_streams(display_id)
+
+    def show_project(self) -> None:
+        """Fill the panels and chat panes for the current project"""
+        self.load_project_info()
+        self.update_stats()
+        self.update_insights_display()
+        self.load_tasks()
+        for display_id in self.agent_tabs:
+            self.load_history(display_id)
+
     def open_settings(self) -> None:
         """Open settings dialog"""
         dialog: tk.Toplevel = tk.Toplevel(self.root)
@@ -914,6 +1093,50 @@ Team formed: {datetime.now().strftime('%Y-%m-%d')}
         ttk.Button(button_frame, text="Save", command=save_settings).pack(side=tk.LEFT, padx=5)
         ttk.Button(button_frame, text="Cancel", command=dialog.destroy).pack(side=tk.LEFT, padx=5)
 
+    def clear_response_cache(self) -> None:
+        """Drop all cached agent replies"""
+        self.response_cache.clear()
+        self.update_status("Response cache cleared")
+
+    def export_archive_to_file(self) -> None:
+        """Archive every project to a compressed JSONL file in the background"""
+        path: str = filedialog.asksaveasfilename(parent=self.root, defaultextension=".gz",
+                                                 initialfile="trio-archive.jsonl.gz",
+                                                 filetypes=[("Compressed JSONL", "*.jsonl.gz"), ("JSONL", "*.jsonl")])
+        if not path:
+            return
+        self.update_status(f"Exporting to {Path(path).name}...")
+
+        def export() -> None:
+            try:
+                counts: Dict[str, int] = self.export_archive(path)
+            except (OSError, sqlite3.Error) as e:
+                self.show_error("Export Error", f"Could not write {path}: {str(e)}")
+                return
+            self.update_status(f"Exported {counts['projects']} projects and "
+                               f"{counts['conversations']} messages to {Path(path).name}")
+
+        Thread(target=export, daemon=True).start()
+
+    def import_archive_from_file(self) -> None:
+        """Load an archive in the background; projects already imported only get their new rows"""
+        path: str = filedialog.askopenfilename(parent=self.root, filetypes=[
+            ("Archives", "*.jsonl.gz *.jsonl"), ("All files", "*")])
+        if not path:
+            return
+        self.update_status(f"Importing {Path(path).name}...")
+
+        def load() -> None:
+            try:
+                counts: Dict[str, int] = self.import_archive(path)
+            except (OSError, ValueError, sqlite3.Error) as e:
+                self.show_error("Import Error", f"Could not import {path}: {str(e)}")
+                return
+            self.update_status(f"Imported {counts['projects']} projects and "
+                               f"{counts['conversations']} messages from {Path(path).name}")
+
+        Thread(target=load, daemon=True).start()
+
     def show_all_projects(self) -> None:
         """Show all projects window"""
         dialog: tk.Toplevel = tk.Toplevel(self.root)
@@ -932,14 +1155,11 @@ Team formed: {datetime.now().strftime('%Y-%m-%d')}
         tree.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
 
         # Load projects
-        with self.db_lock:
-            self.cursor.execute('''
-                SELECT id, title, status, created_at, last_activity
-                FROM projects
-                ORDER BY last_activity DESC
-            ''')
-
-            rows: List[Tuple[Any, ...]] = self.cursor.fetchall()
+        rows: List[Tuple[Any, ...]] = self.db.query('''
+            SELECT id, title, status, created_at, last_activity
+            FROM projects
+            ORDER BY last_activity DESC
+        ''')
 
         for row in rows:
             pid: int
@@ -948,9 +1168,21 @@ Team formed: {datetime.now().strftime('%Y-%m-%d')}
             created: str
             last_activity: str
             pid, title, status, created, last_activity = row
-            tree.insert("", tk.END, values=(title, status, created[:10], last_activity[:10]))
+            tree.insert("", tk.END, iid=str(pid), values=(title, status, created[:10], last_activity[:10]))
 
-        ttk.Button(dialog, text="Close", command=dialog.destroy).pack(pady=10)
+        def open_selected(*args: Any) -> None:
+            selection: Tuple[str, ...] = tree.selection()
+            if selection:
+                self.open_project(int(selection[0]))
+                dialog.destroy()
+
+        tree.bind("<Double-1>", open_selected)
+
+        button_frame = ttk.Frame(dialog)
+        button_frame.pack(pady=10)
+
+        ttk.Button(button_frame, text="Open", command=open_selected).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="Close", command=dialog.destroy).pack(side=tk.LEFT, padx=5)
 
     def show_insights(self) -> None:
         """Show insights window"""
@@ -963,15 +1195,12 @@ Team formed: {datetime.now().strftime('%Y-%m-%d')}
         text.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
 
         # Load all insights
-        with self.db_lock:
-            self.cursor.execute('''
-                SELECT content, timestamp, insight_type
-                FROM insights
-                ORDER BY timestamp DESC
-                LIMIT 50
-            ''')
-
-            insights: List[Tuple[str, str, str]] = self.cursor.fetchall()
+        insights: List[Tuple[Any, ...]] = self.db.query('''
+            SELECT content, timestamp, insight_type
+            FROM insights
+            ORDER BY timestamp DESC
+            LIMIT 50
+        ''')
 
         for content, timestamp, itype in insights:
             time_str: str = datetime.fromisoformat(timestamp).strftime("%Y-%m-%d %H:%M")
@@ -979,6 +1208,132 @@ Team formed: {datetime.now().strftime('%Y-%m-%d')}
 
         ttk.Button(dialog, text="Close", command=dialog.destroy).pack(pady=10)
 
+    def show_search(self) -> None:
+        """Show the conversation and insight search window"""
+        if not self.ready.is_set():
+            return
+        dialog: tk.Toplevel = tk.Toplevel(self.root)
+        dialog.title("Search")
+        dialog.geometry("700x500")
+        dialog.transient(self.root)
+
+        search_frame = ttk.Frame(dialog)
+        search_frame.pack(fill=tk.X, padx=10, pady=(10, 0))
+
+        query_entry = ttk.Entry(search_frame)
+        query_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(0, 5))
+        query_entry.focus()
+
+        current_only_var = tk.BooleanVar(value=self.current_project_id is not None)
+        ttk.Checkbutton(search_frame, text="Current project only",
+                        variable=current_only_var).pack(side=tk.LEFT, padx=(0, 5))
+
+        results = scrolledtext.ScrolledText(dialog, wrap=tk.WORD, state=tk.DISABLED)
+        results.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        results.tag_config("header", foreground="gray", font=("Arial", 9, "italic"))
+        results.tag_config("match", background="#FFE066")
+
+        def run_search(*args: Any) -> None:
+            query: str = query_entry.get().strip()
+            project_id: Optional[int] = self.current_project_id if current_only_var.get() else None
+
+            try:
+                rows: List[Tuple[Any, ...]] = self.search_history(query, project_id)
+            except sqlite3.OperationalError as e:
+                messagebox.showerror("Search Error", f"Search failed: {str(e)}", parent=dialog)
+                return
+
+            results.config(state=tk.NORMAL)
+            results.delete("1.0", tk.END)
+            if query and not rows:
+                results.insert(tk.END, "No matches.", "header")
+
+            for kind, row_id, pid, source, snippet, timestamp in rows:
+                time_str: str = datetime.fromisoformat(timestamp).strftime("%Y-%m-%d %H:%M")
+                results.insert(tk.END, f"[{time_str}] {kind} · {source}\n", "header")
+
+                # Highlight the marked matches
+                for i, part in enumerate(snippet.split(SEARCH_MATCH_START)):
+                    if i == 0:
+                        results.insert(tk.END, part)
+                        continue
+                    hit, _, rest = part.partition(SEARCH_MATCH_END)
+                    results.insert(tk.END, hit, "match")
+                    results.insert(tk.END, rest)
+                results.insert(tk.END, "\n\n")
+
+            results.config(state=tk.DISABLED)
+
+        query_entry.bind("<Return>", run_search)
+        ttk.Button(search_frame, text="Search", command=run_search).pack(side=tk.LEFT)
+
+        ttk.Button(dialog, text="Close", command=dialog.destroy).pack(pady=(0, 10))
+
+    def show_performance(self) -> None:
+        """Show API latency, token and cost metrics"""
+        dialog: tk.Toplevel = tk.Toplevel(self.root)
+        dialog.title("Performance")
+        dialog.geometry("900x600")
+        dialog.transient(self.root)
+
+        ttk.Label(dialog, text=f"API calls, last {METRICS_WINDOW_DAYS} days",
+                  font=("Arial", 11, "bold")).pack(anchor=tk.W, padx=10, pady=(10, 0))
+
+        def make_tree(columns: Tuple[str, ...], height: int) -> ttk.Treeview:
+            tree = ttk.Treeview(dialog, columns=columns, show="headings", height=height)
+            for column in columns:
+                tree.heading(column, text=column)
+                tree.column(column, width=80, anchor=tk.E)
+            tree.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+            return tree
+
+        calls_tree: ttk.Treeview = make_tree(("Agent", "Call Site", "Calls", "Errors", "p50 ms", "p95 ms",
+                                              "TTFT p50", "TTFT p95", "Tokens In", "Tokens Out", "Cost $"), 8)
+        days_tree: ttk.Treeview = make_tree(("Day", "Calls", "Failed", "Tokens In", "Tokens Out",
+                                             "Cache Read", "Cache Write", "Cost $"), 10)
+
+        def ms(value: Optional[float]) -> str:
+            return f"{value:.0f}" if value is not None else "-"
+
+        def refresh() -> None:
+            metrics: Dict[str, List[Dict[str, Any]]] = self.get_api_metrics()
+            calls_tree.delete(*calls_tree.get_children())
+            for row in metrics["calls"]:
+                calls_tree.insert("", tk.END, values=(
+                    self.agents[row["agent"]]["name"] if row["agent"] in self.agents else row["agent"],
+                    row["call_site"], row["calls"], row["errors"], ms(row["p50_ms"]), ms(row["p95_ms"]),
+                    ms(row["ttft_p50_ms"]), ms(row["ttft_p95_ms"]), row["input_tokens"], row["output_tokens"],
+                    f"{row['cost_usd']:.4f}"))
+            days_tree.delete(*days_tree.get_children())
+            for row in metrics["days"]:
+                days_tree.insert("", tk.END, values=(
+                    row["day"], row["calls"], row["failed"], row["input_tokens"], row["output_tokens"],
+                    row["cache_read_tokens"], row["cache_write_tokens"], f"{row['cost_usd']:.4f}"))
+
+        def export(fmt: str) -> None:
+            path: str = filedialog.asksaveasfilename(parent=dialog, defaultextension=f".{fmt}",
+                                                     initialfile=f"api_calls.{fmt}",
+                                                     filetypes=[(fmt.upper(), f"*.{fmt}")])
+            if not path:
+                return
+            try:
+                with open(path, "w", encoding="utf-8", newline="") as f:
+                    count: int = self.export_api_calls(f, fmt)
+            except OSError as e:
+                messagebox.showerror("Export Error", f"Could not write {path}: {str(e)}", parent=dialog)
+                return
+            self.update_status(f"Exported {count} API calls to {Path(path).name}")
+
+        button_frame = ttk.Frame(dialog)
+        button_frame.pack(pady=10)
+
+        ttk.Button(button_frame, text="Refresh", command=refresh).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="Export JSON", command=lambda: export("json")).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="Export CSV", command=lambda: export("csv")).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="Close", command=dialog.destroy).pack(side=tk.LEFT, padx=5)
+
+        refresh()
+
     def show_user_guide(self) -> None:
         """Show user guide"""
         messagebox.showinfo("User Guide", 
@@ -1005,9 +1360,35 @@ Team formed: {datetime.now().strftime('%Y-%m-%d')}
     def on_closing(self) -> None:
         """Handle app closing"""
         if messagebox.askokcancel("Quit", "Do you want to quit?"):
-            self.conn.close()
+            # Cancel in-flight agent calls, then commit any queued writes before closing
+            if self.profiler is not None:
+                self.profile_var.set(False)
+                self.toggle_profiling()
+            self.close()
             self.root.destroy()
 
+    def toggle_trace(self) -> None:
+        """Start or stop writing DB, UI, lock and API timings to the trace file"""
+        if self.trace_var.get():
+            TRACER.start(TRACE_FILE)
+            self.update_status(f"Recording trace to {TRACE_FILE} (open it in ui.perfetto.dev)")
+        else:
+            TRACER.stop()
+            self.update_status(f"Trace saved to {TRACER.path}")
+
+    def toggle_profiling(self) -> None:
+        """Start or stop profiling the UI thread with cProfile"""
+        if self.profile_var.get():
+            import cProfile
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+            self.update_status("Profiling the UI thread...")
+        elif self.profiler is not None:
+            self.profiler.disable()
+            self.profiler.dump_stats(self.profile_path)
+            self.profiler = None
+            self.update_status(f"Profile saved to {self.profile_path} (python -m pstats {self.profile_path})")
+
 def main() -> None:
     """Main entry point"""
     root: tk.Tk = tk.Tk()
@@ -0,0 +1,230 @@
+"""
+ADHD Productivity Trio - Command Line
+Talk to the team without the GUI, from a terminal, a script or cron.
+
+    python trio_cli.py chat proto "What's my next step?"
+    python trio_cli.py team "Should I ship this week?" --follow-up
+    python trio_cli.py capture "Idea: a dark mode"
+    python trio_cli.py recover
+    python trio_cli.py tasks
+    python trio_cli.py done 42 --score 9
+    python trio_cli.py export --output project.json
+    python trio_cli.py export --all --format jsonl --output backup.jsonl.gz
+    python trio_cli.py import backup.jsonl.gz
+    python trio_cli.py metrics --format csv --output api_calls.csv
+"""
+
+import argparse
+import json
+import sys
+from typing import Dict, List, Optional, Set
+
+from trio_core import AGENTS, CONFIG_FILE, CONTEXT_RECOVERY_PROMPT, TrioCore
+
+# Seconds to wait on exit for background work such as summaries
+DRAIN_TIMEOUT_S: float = 60.0
+ARCHIVE_DEFAULT_NAME: str = "trio-archive.jsonl.gz"
+
+
+class ConsoleTrio(TrioCore):
+    """TrioCore that prints the team's replies to stdout"""
+
+    def __init__(self) -> None:
+        self.failed: bool = False
+        self.printed: Set[str] = set()  # streams with text on screen
+        super().__init__(warm_up=False)
+
+    def display_message(self, agent_id: str, sender: str, message: str, tag: str) -> None:
+        """Print a complete reply"""
+        print(f"{sender}\n{message}\n", flush=True)
+
+    def show_error(self, title: str, message: str) -> None:
+        """Print an error and remember to exit non-zero"""
+        self.failed = True
+        super().show_error(title, message)
+
+    def begin_stream(self, display_id: str, sender: str, tag: str) -> str:
+        """Print the reply header; the text follows as it streams"""
+        print(sender, flush=True)
+        return display_id
+
+    def reset_stream(self, stream_id: str) -> None:
+        """Printed text can't be taken back, so start the retried reply on a new line"""
+        if stream_id in self.printed:
+            self.printed.discard(stream_id)
+            print("\n(retrying)", flush=True)
+
+    def append_stream(self, stream_id: str, text: str) -> None:
+        """Print a streamed text delta"""
+        self.printed.add(stream_id)
+        sys.stdout.write(text)
+        sys.stdout.flush()
+
+    def end_stream(self, stream_id: str) -> None:
+        """End the streamed reply"""
+        self.printed.discard(stream_id)
+        print("\n", flush=True)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Command line arguments"""
+    parser = argparse.ArgumentParser(description="ADHD Productivity Trio from the command line")
+    parser.add_argument("--project", type=int,
+                        help="project id (default: the most recently active project)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    chat = commands.add_parser("chat", help="send a message to one agent")
+    chat.add_argument("agent", choices=list(AGENTS))
+    chat.add_argument("message")
+
+    team = commands.add_parser("team", help="ask both agents")
+    team.add_argument("message")
+    team.add_argument("--follow-up", action="store_true", help="let Proto respond to Spark's take")
+
+    capture = commands.add_parser("capture", help="quick capture a thought for Spark")
+    capture.add_argument("content")
+
+    recover = commands.add_parser("recover", help="ask Proto where you left off")
+    recover.add_argument("--fresh", action="store_true", help="ignore a cached answer")
+
+    commands.add_parser("tasks", help="list open tasks")
+
+    done = commands.add_parser("done", help="mark a task complete")
+    done.add_argument("task", type=int, help="task id, as listed by tasks")
+    done.add_argument("--score", type=int, default=8, choices=range(1, 11), metavar="1-10",
+                      help="how good it felt (default: 8)")
+
+    export = commands.add_parser("export", help="write the project's data as JSON, or an archive")
+    export.add_argument("--format", choices=["json", "jsonl", "columns"], default="json",
+                        help="json: one document; jsonl: a row per line; columns: column arrays per "
+                             "row group (archives can be imported again)")
+    export.add_argument("--all", action="store_true", help="archive every project (jsonl and columns only)")
+    export.add_argument("--output", "-o", help="file to write; archives ending in .gz are compressed "
+                                               f"(default: stdout, or {ARCHIVE_DEFAULT_NAME} for archives)")
+
+    import_ = commands.add_parser("import", help="load an archive written by export --format jsonl or columns")
+    import_.add_argument("archive")
+
+    metrics = commands.add_parser("metrics", help="write the API call log as JSON or CSV")
+    metrics.add_argument("--format", choices=["json", "csv"], default="json")
+    metrics.add_argument("--days", type=int, help="only the last N days (default: everything)")
+    metrics.add_argument("--output", "-o", help="file to write (default: stdout)")
+
+    return parser
+
+
+def write_archive(trio: ConsoleTrio, args: argparse.Namespace, project_ids: Optional[List[int]]) -> int:
+    """Export projects (all when project_ids is None) as an archive; returns the exit code"""
+    path: str = args.output or ARCHIVE_DEFAULT_NAME
+    counts: Dict[str, int] = trio.export_archive(path, project_ids, "columns" if args.format == "columns" else "rows")
+    print(f"Exported {', '.join(f'{count} {table}' for table, count in counts.items())} to {path}",
+          file=sys.stderr)
+    return 0
+
+
+def run_command(trio: ConsoleTrio, args: argparse.Namespace) -> int:
+    """Run one command against the current project; returns the exit code"""
+    if args.command in ("export", "import", "tasks", "done", "metrics"):
+        # These don't talk to Claude, so skip importing the SDK
+        trio.init_database()
+    else:
+        trio.warm_up()
+
+    if args.command == "metrics":
+        # The call log covers every project
+        if args.output:
+            with open(args.output, "w", encoding="utf-8", newline="") as f:
+                trio.export_api_calls(f, args.format, args.days)
+        else:
+            trio.export_api_calls(sys.stdout, args.format, args.days)
+        return 0
+
+    if args.command == "import":
+        try:
+            counts: Dict[str, int] = trio.import_archive(args.archive)
+        except (OSError, ValueError) as e:
+            print(f"Could not import {args.archive}: {e}", file=sys.stderr)
+            return 1
+        print("Imported " + ", ".join(f"{count} {table}" for table, count in counts.items()))
+        return 0
+
+    if args.command == "export" and args.all:
+        if args.format == "json":
+            print("--all needs --format jsonl or columns.", file=sys.stderr)
+            return 1
+        return write_archive(trio, args, None)
+
+    trio.current_project_id = args.project or trio.latest_project_id()
+    if not trio.current_project_id:
+        print("No projects yet. Create one in the app first.", file=sys.stderr)
+        return 1
+    if not trio.db.query_one('SELECT 1 FROM projects WHERE id = ?', (trio.current_project_id,)):
+        print(f"No project with id {trio.current_project_id}.", file=sys.stderr)
+        return 1
+
+    if args.command == "export":
+        if args.format != "json":
+            return write_archive(trio, args, [trio.current_project_id])
+        data: str = json.dumps(trio.export_project(trio.current_project_id), indent=2, ensure_ascii=False)
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                f.write(data + "\n")
+        else:
+            print(data)
+        return 0
+
+    if args.command == "tasks":
+        for task_id, description, size in trio.get_open_tasks(trio.current_project_id):
+            print(f"{task_id:>5}  [{size}] {description}")
+        return 0
+
+    if args.command == "done":
+        if not trio.db.query_one('SELECT 1 FROM tasks WHERE id = ? AND project_id = ? AND completed = 0',
+                                 (args.task, trio.current_project_id)):
+            print(f"No open task with id {args.task}.", file=sys.stderr)
+            return 1
+        trio.record_task_completion(args.task, args.score)
+        print("Done! 🎉")
+        return 0
+
+    if not trio.client:
+        print(f"Claude API client not initialized. Add your API key to {CONFIG_FILE}.", file=sys.stderr)
+        return 1
+
+    if args.command == "chat":
+        trio.runtime.submit(trio.chat(trio.current_project_id, args.agent, args.message)).result()
+    elif args.command == "team":
+        # Two replies streaming at once would interleave, so print them whole
+        trio.config["streaming"] = False
+        trio.runtime.submit(trio.team_discussion(trio.current_project_id, args.message, args.follow_up)).result()
+    elif args.command == "capture":
+        trio.add_capture(args.content)
+        print("Captured.")
+    elif args.command == "recover":
+        trio.runtime.submit(trio.send_to_agent(trio.current_project_id, "proto", CONTEXT_RECOVERY_PROMPT,
+                                               cacheable=True, bypass_cache=args.fresh, call_site="recovery")).result()
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Main entry point; returns the process exit code"""
+    args: argparse.Namespace = build_parser().parse_args(argv)
+    trio: ConsoleTrio = ConsoleTrio()
+    drain: bool = True
+    exit_code: int = 1
+
+    try:
+        exit_code = run_command(trio, args)
+    except KeyboardInterrupt:
+        drain = False
+        exit_code = 130
+    finally:
+        # Let Spark's capture reply and summary updates finish before exiting
+        trio.close(drain=drain, timeout=DRAIN_TIMEOUT_S)
+
+    # Agent errors are reported through show_error rather than raised
+    return 1 if exit_code == 0 and trio.failed else exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,2316 @@
+"""
+ADHD Productivity Trio - Core
+Database, agents and agent calls, with no UI dependencies so the team can
+be scripted, run on a server or benchmarked without a display.
+"""
+
+import asyncio
+import csv
+import gzip
+import sqlite3
+import json
+import os
+import hashlib
+import heapq
+import itertools
+import math
+import random
+import re
+import time
+import sys
+import traceback
+from contextlib import contextmanager
+from functools import wraps
+from queue import Queue, Empty
+from threading import Thread, Lock, Event, current_thread, get_ident
+from concurrent.futures import Future
+from typing import (TYPE_CHECKING, Dict, List, Optional, Tuple, Any, Awaitable, Callable, Coroutine,
+                    Iterator, NamedTuple, Sequence, TextIO, Union)
+
+if TYPE_CHECKING:
+    # The SDK (with httpx and pydantic) takes a second or more to import, so
+    # it is only imported when the client is created; see warm_up()
+    import anthropic
+
+# Constants
+APP_VERSION: str = "1.0.0"
+APP_NAME: str = "ADHD Productivity Trio"
+DB_NAME: str = "productivity_trio.db"
+CONFIG_FILE: str = "config.json"
+DB_READ_POOL_SIZE: int = 4  # Idle read connections kept open
+DB_CACHE_SIZE_KIB: int = -16000  # Negative cache_size is in KiB (16 MB page cache per connection)
+DB_MMAP_SIZE: int = 256 * 1024 * 1024
+WRITE_FLUSH_INTERVAL_MS: int = 200  # Queued writes are group-committed at least this often
+WRITE_BATCH_SIZE: int = 256  # ...or as soon as this many are waiting
+BACKFILL_CHUNK_ROWS: int = 5000  # Rows per backfill transaction
+PRIORITY_INTERACTIVE: int = 0  # Scheduler lanes: lower numbers are served first
+PRIORITY_BACKGROUND: int = 1
+RETRY_BASE_DELAY_S: float = 1.0  # Backoff doubles from here per retry...
+RETRY_MAX_DELAY_S: float = 30.0  # ...up to this cap, with full jitter
+CONTEXT_PAGE_SIZE: int = 50  # History rows fetched per page while packing the context window
+SEARCH_MATCH_START: str = "\x02"  # Marks search hits inside result snippets
+SEARCH_MATCH_END: str = "\x03"
+TASK_AGENT: str = "proto"  # The steps in this agent's task blocks are saved as tasks...
+TASK_CALL_SITES: Tuple[str, ...] = ("chat", "intro")  # ...in direct replies; recaps and team turns repeat them
+TASK_BLOCK_START: str = "[TASKS]"  # Task blocks sit between these two lines
+TASK_BLOCK_END: str = "[/TASKS]"
+TASK_MAX_LENGTH: int = 300  # Longer list items are explanations rather than steps
+METRICS_WINDOW_DAYS: int = 30  # API call metrics are summarized over this many days
+API_CALL_COLUMNS: List[str] = ["id", "created_at", "project_id", "agent", "call_site", "model", "streamed",
+                               "status", "ttft_ms", "latency_ms", "input_tokens", "output_tokens",
+                               "cache_read_tokens", "cache_write_tokens", "cost_usd"]
+ARCHIVE_FORMAT: str = "trio-archive"  # Header of export_archive() files...
+ARCHIVE_VERSION: int = 1  # ...and the layout version importers understand
+ARCHIVE_BATCH_ROWS: int = 10000  # Rows per archive read, row group and import transaction
+ARCHIVE_COMPRESS_LEVEL: int = 1  # gzip level 6 files are about 25% smaller but take four times as long
+ARCHIVE_COLUMNS: Dict[str, List[str]] = {  # Archived tables, parents first
+    "projects": ["id", "title", "description", "created_at", "last_activity", "status", "initial_enthusiasm",
+                 "abandonment_count"],
+    "conversations": ["id", "project_id", "agent", "message", "timestamp", "context_snapshot", "token_count"],
+    "tasks": ["id", "project_id", "description", "size", "completed", "completed_at", "dopamine_score",
+              "created_at"],
+    "insights": ["id", "project_id", "insight_type", "content", "timestamp"]
+}
+TRACE_ENV: str = "TRIO_TRACE"  # Set to 1 (or a file path) to trace from startup
+TRACE_FILE: str = "trio_trace.json"
+TRACE_MAX_BYTES: int = 20 * 1024 * 1024  # Trace files rotate at this size...
+TRACE_BACKUPS: int = 3  # ...keeping this many older ones
+TRACE_ARG_CHARS: int = 120  # SQL and messages are trimmed to this length in traces
+PROFILE_ENV: str = "TRIO_PROFILE"  # Set to 1 (or a file path) to profile the UI thread from startup
+PROFILE_FILE: str = "trio_profile.pstats"
+
+def estimate_tokens(text: str) -> int:
+    """Cheap local token estimate: about four UTF-8 bytes per token
+
+    Kept in step with ESTIMATE_TOKENS_SQL so cached per-row counts agree.
+    """
+    return (len(text.encode("utf-8")) + 3) // 4
+
+ESTIMATE_TOKENS_SQL: str = "(length(CAST(message AS BLOB)) + 3) / 4"
+
+TASK_LINE = re.compile(r"^\s*(?:\d{1,2}[.)]|[-*] \[ \])\s+(.+)$")
+TASK_MINUTES = re.compile(r"(\d+)\s*(?:-\s*\d+\s*)?(min|minutes?|hours?|hrs?|h)\b", re.IGNORECASE)
+TASK_EXIT_POINT = re.compile(r"exit point|guilt[- ]free|\b(?:can|could|may) (?:stop|pause)\b", re.IGNORECASE)
+
+def extract_tasks(text: str) -> List[Tuple[str, str]]:
+    """Pull (description, size) tasks out of the numbered steps and checkboxes in a reply's task blocks
+
+    Only lines between TASK_BLOCK_START and TASK_BLOCK_END count, so recaps,
+    options and other lists in the reply don't become tasks; exit points
+    ("you can stop here guilt-free") are skipped even inside a block. Size
+    comes from a time estimate in the step, e.g. "(5 min)": tiny up to 15
+    minutes, small up to an hour, large beyond, tiny when there is none.
+    """
+    tasks: List[Tuple[str, str]] = []
+    in_block: bool = False
+    for line in text.splitlines():
+        marker: str = line.strip().replace("**", "").upper()
+        if marker in (TASK_BLOCK_START, TASK_BLOCK_END):
+            in_block = marker == TASK_BLOCK_START
+            continue
+        match: Optional[re.Match] = TASK_LINE.match(line) if in_block else None
+        if not match:
+            continue
+        description: str = match.group(1).replace("**", "").replace("__", "").strip().rstrip(":")
+        if not description or len(description) > TASK_MAX_LENGTH or TASK_EXIT_POINT.search(description):
+            continue
+
+        size: str = "tiny"
+        estimate: Optional[re.Match] = TASK_MINUTES.search(description)
+        if estimate:
+            minutes: int = int(estimate.group(1)) * (1 if estimate.group(2).lower().startswith("m") else 60)
+            size = "tiny" if minutes <= 15 else "small" if minutes <= 60 else "large"
+        tasks.append((description, size))
+    return tasks
+
+def percentile(values: Sequence[float], fraction: float) -> Optional[float]:
+    """Nearest-rank percentile of already sorted values, e.g. fraction 0.95 for p95"""
+    if not values:
+        return None
+    return values[max(1, math.ceil(fraction * len(values))) - 1]
+
+def open_archive(path: str, mode: str) -> TextIO:
+    """Open an archive for text reading ("r") or writing ("w"), gzipped if path ends in .gz"""
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8", compresslevel=ARCHIVE_COMPRESS_LEVEL)
+    return open(path, mode, encoding="utf-8")
+
+def read_archive(lines: Iterator[str]) -> Iterator[Tuple[str, List[Dict[str, Any]]]]:
+    """(table, rows) batches of at most ARCHIVE_BATCH_ROWS from an archive's lines after the header
+
+    Accepts both layouts; rows come back as dicts either way.
+    """
+    table: Optional[str] = None
+    batch: List[Dict[str, Any]] = []
+    for line in lines:
+        if not line.strip():
+            continue
+        record: Dict[str, Any] = json.loads(line)
+        if record["table"] != table or len(batch) >= ARCHIVE_BATCH_ROWS:
+            if batch:
+                yield table, batch
+            table, batch = record["table"], []
+        if "row" in record:
+            batch.append(record["row"])
+        else:
+            batch.extend(dict(zip(record["columns"], values)) for values in zip(*record["data"]))
+    if batch:
+        yield table, batch
+
+class Backfill(NamedTuple):
+    """A data migration applied in rowid chunks after startup
+
+    sql is run once per chunk with (first_rowid, last_rowid) parameters and
+    must only touch rows in that range. The range ends at the table's last
+    rowid when the migration ran; rows written later are the new schema's
+    responsibility. Progress is stored per chunk in schema_backfills, so an
+    interrupted backfill resumes where it stopped.
+    """
+    name: str
+    table: str
+    sql: str
+
+class Migration(NamedTuple):
+    """One schema version: quick steps run in a single transaction at startup
+
+    A step is either a SQL string or a callable taking the writer cursor.
+    Backfills for large tables run afterwards in the background.
+    """
+    description: str
+    steps: Sequence[Union[str, Callable[[sqlite3.Cursor], None]]]
+    backfills: Sequence[Backfill] = ()
+
+# Schema migrations, applied in order on startup. PRAGMA user_version records
+# how many have run, so each one runs exactly once per database. Only ever
+# append to this list.
+MIGRATIONS: List[Migration] = [
+    Migration("Indexes for history, insights and active-task lookups", [
+        'CREATE INDEX IF NOT EXISTS idx_conversations_project_agent ON conversations (project_id, agent, id)',
+        'CREATE INDEX IF NOT EXISTS idx_insights_project_time ON insights (project_id, timestamp)',
+        'CREATE INDEX IF NOT EXISTS idx_tasks_project_completed ON tasks (project_id, completed)'
+    ]),
+    Migration("Full-text search over conversations and insights", [
+        '''CREATE VIRTUAL TABLE IF NOT EXISTS conversations_fts USING fts5(
+            message, content='conversations', content_rowid='id', tokenize='porter unicode61')''',
+        '''CREATE TRIGGER IF NOT EXISTS conversations_fts_insert AFTER INSERT ON conversations BEGIN
+            INSERT INTO conversations_fts (rowid, message) VALUES (new.id, new.message);
+        END''',
+        '''CREATE TRIGGER IF NOT EXISTS conversations_fts_delete AFTER DELETE ON conversations BEGIN
+            INSERT INTO conversations_fts (conversations_fts, rowid, message) VALUES ('delete', old.id, old.message);
+        END''',
+        '''CREATE TRIGGER IF NOT EXISTS conversations_fts_update AFTER UPDATE OF message ON conversations BEGIN
+            INSERT INTO conversations_fts (conversations_fts, rowid, message) VALUES ('delete', old.id, old.message);
+            INSERT INTO conversations_fts (rowid, message) VALUES (new.id, new.message);
+        END''',
+        '''CREATE VIRTUAL TABLE IF NOT EXISTS insights_fts USING fts5(
+            content, content='insights', content_rowid='id', tokenize='porter unicode61')''',
+        '''CREATE TRIGGER IF NOT EXISTS insights_fts_insert AFTER INSERT ON insights BEGIN
+            INSERT INTO insights_fts (rowid, content) VALUES (new.id, new.content);
+        END''',
+        '''CREATE TRIGGER IF NOT EXISTS insights_fts_delete AFTER DELETE ON insights BEGIN
+            INSERT INTO insights_fts (insights_fts, rowid, content) VALUES ('delete', old.id, old.content);
+        END''',
+        '''CREATE TRIGGER IF NOT EXISTS insights_fts_update AFTER UPDATE OF content ON insights BEGIN
+            INSERT INTO insights_fts (insights_fts, rowid, content) VALUES ('delete', old.id, old.content);
+            INSERT INTO insights_fts (rowid, content) VALUES (new.id, new.content);
+        END'''
+    ], [
+        Backfill("conversations_fts", "conversations", '''
+            INSERT INTO conversations_fts (rowid, message)
+            SELECT id, message FROM conversations WHERE id BETWEEN ? AND ?
+        '''),
+        Backfill("insights_fts", "insights", '''
+            INSERT INTO insights_fts (rowid, content)
+            SELECT id, content FROM insights WHERE id BETWEEN ? AND ?
+        ''')
+    ]),
+    Migration("Cached token estimate per conversation row", [
+        'ALTER TABLE conversations ADD COLUMN token_count INTEGER'
+    ], [
+        Backfill("conversations_token_count", "conversations", f'''
+            UPDATE conversations SET token_count = {ESTIMATE_TOKENS_SQL}
+            WHERE id BETWEEN ? AND ? AND token_count IS NULL
+        ''')
+    ]),
+    Migration("Rolling per-agent conversation summaries", [
+        '''CREATE TABLE IF NOT EXISTS conversation_summaries (
+            project_id INTEGER NOT NULL,
+            agent TEXT NOT NULL,
+            summary TEXT NOT NULL,
+            through_id INTEGER NOT NULL,
+            token_count INTEGER NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (project_id, agent),
+            FOREIGN KEY (project_id) REFERENCES projects (id)
+        )'''
+    ]),
+    # Triggers count rows written after the migration; the backfill adds the
+    # conversations that were already there. Tasks are few, so they are
+    # counted in the migration itself.
+    Migration("Per-project counters for the stats panel", [
+        '''CREATE TABLE IF NOT EXISTS project_stats (
+            project_id INTEGER PRIMARY KEY,
+            message_count INTEGER NOT NULL DEFAULT 0,
+            first_message_at TIMESTAMP,
+            last_message_at TIMESTAMP,
+            open_task_count INTEGER NOT NULL DEFAULT 0,
+            completed_task_count INTEGER NOT NULL DEFAULT 0,
+            FOREIGN KEY (project_id) REFERENCES projects (id)
+        )''',
+        '''CREATE TRIGGER IF NOT EXISTS project_stats_message_insert AFTER INSERT ON conversations
+        WHEN new.project_id IS NOT NULL BEGIN
+            INSERT INTO project_stats (project_id, message_count, first_message_at, last_message_at)
+            VALUES (new.project_id, 1, new.timestamp, new.timestamp)
+            ON CONFLICT (project_id) DO UPDATE SET
+                message_count = message_count + 1,
+                first_message_at = IFNULL(first_message_at, excluded.first_message_at),
+                last_message_at = excluded.last_message_at;
+        END''',
+        '''CREATE TRIGGER IF NOT EXISTS project_stats_message_delete AFTER DELETE ON conversations BEGIN
+            UPDATE project_stats SET message_count = message_count - 1 WHERE project_id = old.project_id;
+        END''',
+        '''CREATE TRIGGER IF NOT EXISTS project_stats_task_insert AFTER INSERT ON tasks
+        WHEN new.project_id IS NOT NULL BEGIN
+            INSERT INTO project_stats (project_id, open_task_count, completed_task_count)
+            VALUES (new.project_id, new.completed = 0, new.completed != 0)
+            ON CONFLICT (project_id) DO UPDATE SET
+                open_task_count = open_task_count + excluded.open_task_count,
+                completed_task_count = completed_task_count + excluded.completed_task_count;
+        END''',
+        '''CREATE TRIGGER IF NOT EXISTS project_stats_task_update AFTER UPDATE OF completed ON tasks
+        WHEN (old.completed != 0) != (new.completed != 0) BEGIN
+            UPDATE project_stats SET
+                open_task_count = open_task_count + (old.completed != 0) - (new.completed != 0),
+                completed_task_count = completed_task_count + (new.completed != 0) - (old.completed != 0)
+            WHERE project_id = new.project_id;
+        END''',
+        '''CREATE TRIGGER IF NOT EXISTS project_stats_task_delete AFTER DELETE ON tasks BEGIN
+            UPDATE project_stats SET
+                open_task_count = open_task_count - (old.completed = 0),
+                completed_task_count = completed_task_count - (old.completed != 0)
+            WHERE project_id = old.project_id;
+        END''',
+        '''INSERT INTO project_stats (project_id, open_task_count, completed_task_count)
+            SELECT project_id, SUM(completed = 0), SUM(completed != 0) FROM tasks
+            WHERE project_id IS NOT NULL GROUP BY project_id'''
+    ], [
+        Backfill("project_stats_messages", "conversations", '''
+            INSERT INTO project_stats (project_id, message_count, first_message_at, last_message_at)
+            SELECT project_id, COUNT(*), MIN(timestamp), MAX(timestamp) FROM conversations
+            WHERE id BETWEEN ? AND ? AND project_id IS NOT NULL GROUP BY project_id
+            ON CONFLICT (project_id) DO UPDATE SET
+                message_count = message_count + excluded.message_count,
+                first_message_at = MIN(IFNULL(first_message_at, excluded.first_message_at),
+                                       excluded.first_message_at),
+                last_message_at = MAX(IFNULL(last_message_at, excluded.last_message_at),
+                                      excluded.last_message_at)
+        ''')
+    ]),
+    Migration("Task lookup by description, so repeated steps aren't saved twice", [
+        'CREATE INDEX IF NOT EXISTS idx_tasks_project_description ON tasks (project_id, description)'
+    ]),
+    Migration("Latency, token and cost metrics per API call", [
+        '''CREATE TABLE IF NOT EXISTS api_calls (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            project_id INTEGER,
+            agent TEXT NOT NULL,
+            call_site TEXT NOT NULL,
+            model TEXT NOT NULL,
+            streamed INTEGER NOT NULL,
+            status TEXT NOT NULL,
+            ttft_ms REAL,
+            latency_ms REAL NOT NULL,
+            input_tokens INTEGER NOT NULL DEFAULT 0,
+            output_tokens INTEGER NOT NULL DEFAULT 0,
+            cache_read_tokens INTEGER NOT NULL DEFAULT 0,
+            cache_write_tokens INTEGER NOT NULL DEFAULT 0,
+            cost_usd REAL NOT NULL DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (project_id) REFERENCES projects (id)
+        )''',
+        'CREATE INDEX IF NOT EXISTS idx_api_calls_created ON api_calls (created_at)'
+    ]),
+    # Archives name the database they came from; archive_imports maps its
+    # projects to local ones and records the last source row id imported per
+    # table, so importing an archive again only adds what is new.
+    Migration("Database id and archive import watermarks", [
+        '''CREATE TABLE IF NOT EXISTS database_info (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        )''',
+        "INSERT OR IGNORE INTO database_info (key, value) VALUES ('database_id', lower(hex(randomblob(16))))",
+        '''CREATE TABLE IF NOT EXISTS archive_imports (
+            source_id TEXT NOT NULL,
+            source_project_id INTEGER NOT NULL,
+            project_id INTEGER NOT NULL,
+            conversations_through INTEGER NOT NULL DEFAULT 0,
+            tasks_through INTEGER NOT NULL DEFAULT 0,
+            insights_through INTEGER NOT NULL DEFAULT 0,
+            imported_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (source_id, source_project_id),
+            FOREIGN KEY (project_id) REFERENCES projects (id)
+        )'''
+    ])
+]
+
+# The work each table's row triggers do, as set-based SQL over an id range,
+# for Database.bulk_insert(). The migrations' backfills already do exactly
+# that for conversations and insights.
+BACKFILLS: Dict[str, Backfill] = {backfill.name: backfill for migration in MIGRATIONS
+                                  for backfill in migration.backfills}
+BULK_DERIVED: Dict[str, List[str]] = {
+    "conversations": [BACKFILLS["conversations_fts"].sql, BACKFILLS["project_stats_messages"].sql],
+    "insights": [BACKFILLS["insights_fts"].sql],
+    "tasks": ['''
+        INSERT INTO project_stats (project_id, open_task_count, completed_task_count)
+        SELECT project_id, SUM(completed = 0), SUM(completed != 0) FROM tasks
+        WHERE id BETWEEN ? AND ? AND project_id IS NOT NULL GROUP BY project_id
+        ON CONFLICT (project_id) DO UPDATE SET
+            open_task_count = open_task_count + excluded.open_task_count,
+            completed_task_count = completed_task_count + excluded.completed_task_count
+    ''']
+}
+
+class Tracer:
+    """Opt-in recorder of Chrome trace events, for Perfetto or chrome://tracing
+
+    While stopped, span() and @traced functions cost one attribute check.
+    Events are written in the JSON array format; viewers don't need the
+    closing bracket, so a trace cut short by a crash still loads. The file
+    rotates at max_bytes, keeping older traces as .1, .2 and so on.
+    """
+
+    def __init__(self, max_bytes: int = TRACE_MAX_BYTES, backups: int = TRACE_BACKUPS) -> None:
+        self.max_bytes: int = max_bytes
+        self.backups: int = backups
+        self.enabled: bool = False
+        self.path: Optional[str] = None
+        self.file: Optional[TextIO] = None
+        self.written: int = 0
+        self.named_threads: set = set()
+        self.lock: Lock = Lock()
+
+    def start(self, path: str = TRACE_FILE) -> None:
+        """Start writing events to path, replacing an earlier trace there"""
+        with self.lock:
+            if self.file is not None:
+                return
+            self.path = path
+            self.open_file()
+            self.enabled = True
+
+    def stop(self) -> None:
+        """Stop tracing and close the file"""
+        with self.lock:
+            self.enabled = False
+            if self.file is not None:
+                self.file.write("\n]\n")
+                self.file.close()
+                self.file = None
+
+    def open_file(self) -> None:
+        """Start a new trace file (call with lock held)"""
+        self.file = open(self.path, "w", encoding="utf-8")
+        self.file.write("[")
+        self.written = 1
+        self.named_threads = set()
+
+    def rotate(self) -> None:
+        """Move the full trace file aside and start a new one (call with lock held)"""
+        self.file.write("\n]\n")
+        self.file.close()
+        for number in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{number}"):
+                os.replace(f"{self.path}.{number}", f"{self.path}.{number + 1}")
+        if self.backups:
+            os.replace(self.path, f"{self.path}.1")
+        self.open_file()
+
+    def emit(self, event: Dict[str, Any]) -> None:
+        """Write one event, naming its thread the first time it shows up"""
+        event.setdefault("pid", os.getpid())
+        event.setdefault("tid", get_ident())
+        with self.lock:
+            if self.file is None:
+                return
+            events: List[Dict[str, Any]] = [event]
+            if event["tid"] not in self.named_threads:
+                self.named_threads.add(event["tid"])
+                events.insert(0, {"name": "thread_name", "ph": "M", "pid": event["pid"], "tid": event["tid"],
+                                  "args": {"name": current_thread().name}})
+            for item in events:
+                line: str = ("\n" if self.written == 1 else ",\n") + json.dumps(item, default=str)
+                self.file.write(line)
+                self.written += len(line)
+            if self.written >= self.max_bytes:
+                self.rotate()
+
+    def complete(self, name: str, category: str, start: float, end: float,
+                 args: Optional[Dict[str, Any]] = None) -> None:
+        """Record a finished span on the calling thread; times are time.perf_counter() readings"""
+        if self.enabled:
+            self.emit({"name": name, "cat": category, "ph": "X", "ts": start * 1e6,
+                       "dur": (end - start) * 1e6, "args": args or {}})
+
+    def interval(self, name: str, category: str, start: float, end: float,
+                 args: Optional[Dict[str, Any]] = None, marks: Optional[Dict[str, float]] = None) -> None:
+        """Record a span that may overlap others on its thread, such as a call awaited on the event loop
+
+        marks are named instants inside the span, e.g. the first streamed token.
+        """
+        if not self.enabled:
+            return
+        span_id: int = next(TRACE_IDS)
+        self.emit({"name": name, "cat": category, "ph": "b", "id": span_id, "ts": start * 1e6, "args": args or {}})
+        for mark, at in (marks or {}).items():
+            self.emit({"name": name, "cat": category, "ph": "n", "id": span_id, "ts": at * 1e6,
+                       "args": {"mark": mark}})
+        self.emit({"name": name, "cat": category, "ph": "e", "id": span_id, "ts": end * 1e6})
+
+    @contextmanager
+    def span(self, name: str, category: str, **args: Any) -> Iterator[None]:
+        """Time the body of a with block"""
+        if not self.enabled:
+            yield
+            return
+        start: float = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.complete(name, category, start, time.perf_counter(), args)
+
+TRACER: Tracer = Tracer()
+TRACE_IDS: Iterator[int] = itertools.count(1)
+
+def traced(category: str) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """Decorator recording each call of a method as a span while TRACER is on
+
+    A leading string argument (a query's SQL, a status message) is recorded
+    with the span, trimmed to TRACE_ARG_CHARS.
+    """
+    def decorate(method: Callable[..., Any]) -> Callable[..., Any]:
+        name: str = method.__qualname__
+
+        @wraps(method)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if not TRACER.enabled:
+                return method(*args, **kwargs)
+            start: float = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                detail: Dict[str, Any] = {}
+                if len(args) > 1 and isinstance(args[1], str):
+                    detail["arg"] = " ".join(args[1].split())[:TRACE_ARG_CHARS]
+                TRACER.complete(name, category, start, time.perf_counter(), detail)
+        return wrapper
+    return decorate
+
+class TracedLock:
+    """A Lock that records how long callers wait for it while TRACER is on
+
+    Only contended acquisitions are recorded, as "<name> wait" spans.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name: str = name
+        self.lock: Lock = Lock()
+
+    def __enter__(self) -> "TracedLock":
+        if self.lock.acquire(blocking=False):
+            return self
+        start: float = time.perf_counter()
+        self.lock.acquire()
+        TRACER.complete(f"{self.name} wait", "lock", start, time.perf_counter())
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.lock.release()
+
+class Database:
+    """SQLite data-access layer
+
+    The database runs in WAL mode so readers never wait on the writer. Reads
+    check out a connection from a small pool, and all writes go through one
+    dedicated writer connection serialized by write_lock.
+
+    Fire-and-forget writes can be queued with submit(). A background thread
+    group-commits them in one transaction per flush interval or batch, and
+    flush() waits until everything queued so far is committed.
+    """
+
+    def __init__(self, path: str, pool_size: int = DB_READ_POOL_SIZE) -> None:
+        self.path: str = path
+        self.pool_size: int = pool_size
+        self.pool: Queue = Queue()
+        self.write_lock: TracedLock = TracedLock("db.write_lock")
+        self.writer: sqlite3.Connection = self.connect()
+        self.writer.execute('PRAGMA journal_mode=WAL')
+
+        # Write-behind queue of (sql, params) items and flush markers
+        self.write_queue: Queue = Queue()
+        self.pending_writes: int = 0
+        # Guards pending_writes only; write_lock is held for whole transactions
+        self.pending_lock: Lock = Lock()
+        self.write_thread: Thread = Thread(target=self.run_write_behind, daemon=True)
+        self.write_thread.start()
+
+    def connect(self) -> sqlite3.Connection:
+        """Open a connection with the app's tuned pragmas"""
+        conn: sqlite3.Connection = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute(f'PRAGMA cache_size={DB_CACHE_SIZE_KIB}')
+        conn.execute(f'PRAGMA mmap_size={DB_MMAP_SIZE}')
+        conn.execute('PRAGMA temp_store=MEMORY')
+        return conn
+
+    @contextmanager
+    def reader(self) -> Iterator[sqlite3.Connection]:
+        """Check out a pooled read connection for the calling thread"""
+        try:
+            conn: sqlite3.Connection = self.pool.get_nowait()
+        except Empty:
+            conn = self.connect()
+        try:
+            yield conn
+        finally:
+            if self.pool.qsize() < self.pool_size:
+                self.pool.put(conn)
+            else:
+                conn.close()
+
+    @traced("db")
+    def query(self, sql: str, params: Tuple[Any, ...] = ()) -> List[Tuple[Any, ...]]:
+        """Run a read query and return all rows"""
+        with self.reader() as conn:
+            return conn.execute(sql, params).fetchall()
+
+    @traced("db")
+    def query_one(self, sql: str, params: Tuple[Any, ...] = ()) -> Optional[Tuple[Any, ...]]:
+        """Run a read query and return the first row, if any"""
+        with self.reader() as conn:
+            return conn.execute(sql, params).fetchone()
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Cursor]:
+        """Run writes on the writer connection as one committed transaction"""
+        with self.write_lock:
+            cursor: sqlite3.Cursor = self.writer.cursor()
+            try:
+                yield cursor
+                self.writer.commit()
+            except Exception:
+                self.writer.rollback()
+                raise
+
+    @traced("db")
+    def execute(self, sql: str, params: Tuple[Any, ...] = ()) -> Optional[int]:
+        """Run a single write statement and return its lastrowid"""
+        with self.transaction() as cursor:
+            cursor.execute(sql, params)
+            return cursor.lastrowid
+
+    @traced("db")
+    def migrate(self, migrations: List[Migration]) -> List[Backfill]:
+        """Apply migrations newer than PRAGMA user_version, one transaction each
+
+        Returns the backfills of every applied migration that haven't
+        finished yet; pass them to run_backfills() off the UI thread.
+        """
+        with self.write_lock:
+            self.writer.execute('''
+                CREATE TABLE IF NOT EXISTS schema_backfills (
+                    name TEXT PRIMARY KEY,
+                    last_rowid INTEGER NOT NULL DEFAULT 0,
+                    end_rowid INTEGER,
+                    done INTEGER NOT NULL DEFAULT 0
+                )
+            ''')
+            self.writer.commit()
+
+            version: int = self.writer.execute('PRAGMA user_version').fetchone()[0]
+            if version > len(migrations):
+                raise RuntimeError(f"Database schema version {version} is newer than this app supports "
+                                   f"({len(migrations)}). Please update {APP_NAME}.")
+
+            for number, migration in enumerate(migrations[version:], start=version + 1):
+                cursor: sqlite3.Cursor = self.writer.cursor()
+                cursor.execute('BEGIN IMMEDIATE')
+                try:
+                    for step in migration.steps:
+                        if callable(step):
+                            step(cursor)
+                        else:
+                            cursor.execute(step)
+                    for backfill in migration.backfills:
+                        cursor.execute(f'''
+                            INSERT OR IGNORE INTO schema_backfills (name, end_rowid)
+                            SELECT ?, IFNULL(MAX(rowid), 0) FROM {backfill.table}
+                        ''', (backfill.name,))
+                    cursor.execute(f'PRAGMA user_version = {number}')
+                    cursor.execute('COMMIT')
+                except Exception:
+                    cursor.execute('ROLLBACK')
+                    raise
+
+            done: set = {row[0] for row in self.writer.execute(
+                'SELECT name FROM schema_backfills WHERE done = 1')}
+
+        return [backfill for migration in migrations for backfill in migration.backfills
+                if backfill.name not in done]
+
+    def run_backfills(self, backfills: List[Backfill], chunk_rows: int = BACKFILL_CHUNK_ROWS) -> None:
+        """Run backfills in short rowid-range transactions
+
+        Each chunk takes the write lock only briefly, so the app keeps reading
+        and writing normally while a large table is upgraded.
+        """
+        for backfill in backfills:
+            progress: Optional[Tuple[Any, ...]] = self.query_one(
+                'SELECT last_rowid, end_rowid FROM schema_backfills WHERE name = ?', (backfill.name,))
+            if progress is None:
+                continue
+            start: int = progress[0]
+            end_rowid: int = progress[1] or 0
+
+            while start < end_rowid:
+                stop: int = min(start + chunk_rows, end_rowid)
+                with self.transaction() as cursor:
+                    cursor.execute(backfill.sql, (start + 1, stop))
+                    cursor.execute('UPDATE schema_backfills SET last_rowid = ? WHERE name = ?',
+                                   (stop, backfill.name))
+                start = stop
+
+            self.execute('UPDATE schema_backfills SET done = 1 WHERE name = ?', (backfill.name,))
+
+    def defer_backfill(self, name: str, first_id: int, last_id: int) -> bool:
+        """Have a finished backfill run again over ids first_id..last_id on the next start
+
+        The app's next migrate() picks it up and runs it in the background
+        like any other backfill. Returns False, changing nothing, when the
+        backfill hasn't finished its own range yet; the caller then has to
+        do that work itself.
+        """
+        with self.transaction() as cursor:
+            cursor.execute('''
+                UPDATE schema_backfills SET last_rowid = ?, end_rowid = ?, done = 0
+                WHERE name = ? AND done = 1
+            ''', (first_id - 1, last_id, name))
+            return cursor.rowcount == 1
+
+    @traced("db")
+    def bulk_insert(self, table: str, columns: Sequence[str], rows: Sequence[Tuple[Any, ...]],
+                    after: Optional[Callable[[sqlite3.Cursor, int, int], None]] = None,
+                    derived: Optional[Sequence[str]] = None) -> Tuple[int, int]:
+        """Insert many rows in one transaction, with the table's triggers off
+
+        The triggers are dropped inside the transaction and their work is
+        done once for the whole batch with BULK_DERIVED, or with derived when
+        the caller takes over part of it, which is several times faster than
+        firing them per row; they are back in place when the transaction
+        commits. after, if given, runs in the same
+        transaction with the first and last id inserted. Returns those ids,
+        or (0, -1) when rows is empty.
+        """
+        if not rows:
+            return 0, -1
+        sql: str = f'INSERT INTO {table} ({", ".join(columns)}) VALUES ({", ".join("?" * len(columns))})'
+        with self.write_lock:
+            cursor: sqlite3.Cursor = self.writer.cursor()
+            cursor.execute('BEGIN IMMEDIATE')
+            try:
+                triggers: List[Tuple[str, str]] = cursor.execute(
+                    "SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = ?",
+                    (table,)).fetchall()
+                for name, _ in triggers:
+                    cursor.execute(f'DROP TRIGGER {name}')
+
+                # Ids of rows inserted together by the only writer are consecutive
+                cursor.executemany(sql, rows)
+                last_id: int = cursor.execute(f'SELECT MAX(id) FROM {table}').fetchone()[0]
+                first_id: int = last_id - len(rows) + 1
+                for statement in BULK_DERIVED.get(table, []) if derived is None else derived:
+                    cursor.execute(statement, (first_id, last_id))
+                if after:
+                    after(cursor, first_id, last_id)
+
+                for _, trigger_sql in triggers:
+                    cursor.execute(trigger_sql)
+                cursor.execute('COMMIT')
+            except Exception:
+                cursor.execute('ROLLBACK')
+                raise
+        return first_id, last_id
+
+    def submit(self, sql: str, params: Tuple[Any, ...] = ()) -> None:
+        """Queue a write to be group-committed by the write-behind thread"""
+        with self.pending_lock:
+            self.pending_writes += 1
+        self.write_queue.put((sql, params))
+
+    @traced("db")
+    def flush(self) -> None:
+        """Block until every write queued so far has been committed"""
+        with self.pending_lock:
+            if not self.pending_writes:
+                return
+        done: Event = Event()
+        self.write_queue.put(done)
+        done.wait()
+
+    def run_write_behind(self) -> None:
+        """Write-behind loop: collect queued writes and commit them in batches"""
+        while True:
+            batch: List[Any] = [self.write_queue.get()]
+            deadline: float = time.monotonic() + WRITE_FLUSH_INTERVAL_MS / 1000
+
+            # Keep collecting until the batch is full, the interval is up,
+            # or someone is waiting on a flush
+            while (len(batch) < WRITE_BATCH_SIZE and batch[-1] is not None
+                   and not isinstance(batch[-1], Event)):
+                remaining: float = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.write_queue.get(timeout=remaining))
+                except Empty:
+                    break
+
+            writes: List[Tuple[str, Tuple[Any, ...]]] = [item for item in batch if isinstance(item, tuple)]
+            try:
+                if writes:
+                    self.commit_batch(writes)
+            except Exception:
+                # Never let the writer die, or flush() callers would wait forever
+                pass
+            finally:
+                for item in batch:
+                    if isinstance(item, Event):
+                        item.set()
+            if batch[-1] is None:
+                return
+
+    @traced("db")
+    def commit_batch(self, writes: List[Tuple[str, Tuple[Any, ...]]]) -> None:
+        """Commit a batch in one transaction, falling back to one by one on error"""
+        try:
+            with self.transaction() as cursor:
+                for sql, params in writes:
+                    cursor.execute(sql, params)
+        except sqlite3.Error:
+            traceback.print_exc()
+            for sql, params in writes:
+                try:
+                    self.execute(sql, params)
+                except sqlite3.Error:
+                    traceback.print_exc()
+        finally:
+            with self.pending_lock:
+                self.pending_writes -= len(writes)
+
+    def close(self) -> None:
+        """Commit queued writes, checkpoint the WAL, and close all connections"""
+        self.write_queue.put(None)
+        self.write_thread.join()
+        with self.write_lock:
+            self.writer.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+            self.writer.close()
+        while True:
+            try:
+                self.pool.get_nowait().close()
+            except Empty:
+                break
+
+class ResponseCache:
+    """Persistent SQLite cache of agent replies for deterministic prompts
+
+    Entries are keyed on the agent, model, system prompt and full message
+    history, expire after a TTL, and the least recently used entries are
+    evicted once the cache grows past max_entries.
+    """
+
+    def __init__(self, db: Database, ttl_seconds: float, max_entries: int) -> None:
+        self.db: Database = db
+        self.ttl_seconds: float = ttl_seconds
+        self.max_entries: int = max_entries
+
+    @staticmethod
+    def make_key(agent_id: str, model: str, system_prompt: str,
+                 messages: List[Dict[str, Any]]) -> str:
+        """Hash the inputs that determine a reply into a cache key"""
+        system_hash: str = hashlib.sha256(system_prompt.encode("utf-8")).hexdigest()
+        history_hash: str = hashlib.sha256(
+            json.dumps(messages, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+        return hashlib.sha256(f"{agent_id}|{model}|{system_hash}|{history_hash}".encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return a fresh cached reply and bump its recency, or None
+
+        Blocks on SQLite; call it off the event loop.
+        """
+        now: float = time.time()
+        row: Optional[Tuple[Any, ...]] = self.db.query_one(
+            'SELECT response, created_at FROM response_cache WHERE cache_key = ?', (key,))
+        if row is None:
+            return None
+        # Bookkeeping goes through the write-behind queue, so a hit never waits on the writer
+        if now - row[1] > self.ttl_seconds:
+            self.db.submit('DELETE FROM response_cache WHERE cache_key = ?', (key,))
+            return None
+        self.db.submit('''
+            UPDATE response_cache SET last_used = ?, hits = hits + 1 WHERE cache_key = ?
+        ''', (now, key))
+        return row[0]
+
+    def put(self, key: str, agent_id: str, model: str, response: str) -> None:
+        """Store a reply, then drop expired and least recently used entries
+
+        Blocks on the writer; call it off the event loop.
+        """
+        now: float = time.time()
+        with self.db.transaction() as cursor:
+            cursor.execute('''
+                INSERT OR REPLACE INTO response_cache (cache_key, agent, model, response, created_at, last_used, hits)
+                VALUES (?, ?, ?, ?, ?, ?, 0)
+            ''', (key, agent_id, model, response, now, now))
+            cursor.execute('DELETE FROM response_cache WHERE created_at < ?', (now - self.ttl_seconds,))
+            cursor.execute('''
+                DELETE FROM response_cache WHERE cache_key IN (
+                    SELECT cache_key FROM response_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                )
+            ''', (self.max_entries,))
+
+    def clear(self) -> None:
+        """Remove every cached reply"""
+        self.db.execute('DELETE FROM response_cache')
+
+class RequestHandle:
+    """Cancellation handle for one in-flight agent request
+
+    Wraps the future of the request's coroutine on the agent runtime;
+    cancelling it cancels the coroutine, which aborts the HTTP request
+    (or the wait for a scheduler slot) right away.
+    """
+
+    def __init__(self, agent_id: str) -> None:
+        self.agent_id: str = agent_id
+        self.lock: Lock = Lock()
+        self.cancelled: bool = False
+        self.future: Optional[Future] = None
+
+    def attach(self, future: Future) -> None:
+        """Set the request's future, cancelling it if Stop came first"""
+        with self.lock:
+            self.future = future
+            cancelled: bool = self.cancelled
+        if cancelled:
+            future.cancel()
+
+    def cancel(self) -> None:
+        """Stop the request; safe to call from any thread, more than once"""
+        with self.lock:
+            self.cancelled = True
+            future: Optional[Future] = self.future
+        if future is not None:
+            future.cancel()
+
+
+class RequestScheduler:
+    """Rate-limited, prioritized and retrying gateway for Claude API calls
+
+    Every call waits for a token-bucket slot (requests and estimated input
+    tokens per minute) and one of max_concurrent request slots. When
+    several calls are waiting, the one with the lowest priority number goes
+    first, so interactive chats jump ahead of background intros and
+    summaries. Rate-limit, overload and connection errors are retried with
+    jittered exponential backoff, honoring the server's retry-after header,
+    which also pauses every other caller. Runs on the agent runtime's loop.
+    """
+
+    RETRYABLE_STATUS: Tuple[int, ...] = (408, 409, 429, 500, 502, 503, 504, 529)
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int, max_retries: int,
+                 max_concurrent: int) -> None:
+        self.requests_per_minute: int = requests_per_minute
+        self.tokens_per_minute: int = tokens_per_minute
+        self.max_retries: int = max_retries
+        self.condition: asyncio.Condition = asyncio.Condition()
+        self.slots: asyncio.Semaphore = asyncio.Semaphore(max_concurrent)
+        self.waiting: List[Tuple[int, int]] = []  # heap of (priority, sequence)
+        self.sequence: Iterator[int] = itertools.count()
+        self.request_allowance: float = float(requests_per_minute)
+        self.token_allowance: float = float(tokens_per_minute)
+        self.refilled_at: float = time.monotonic()
+        self.paused_until: float = 0.0
+
+    def refill(self) -> None:
+        """Top up both buckets for the time since the last refill"""
+        now: float = time.monotonic()
+        elapsed: float = now - self.refilled_at
+        self.refilled_at = now
+        self.request_allowance = min(float(self.requests_per_minute),
+                                     self.request_allowance + elapsed * self.requests_per_minute / 60)
+        self.token_allowance = min(float(self.tokens_per_minute),
+                                   self.token_allowance + elapsed * self.tokens_per_minute / 60)
+
+    async def acquire(self, priority: int, tokens: int) -> None:
+        """Wait until this caller is first in line and both buckets have room"""
+        tokens = min(tokens, self.tokens_per_minute)
+        async with self.condition:
+            entry: Tuple[int, int] = (priority, next(self.sequence))
+            heapq.heappush(self.waiting, entry)
+            try:
+                while True:
+                    if self.waiting[0] != entry:
+                        await self.condition.wait()
+                        continue
+
+                    self.refill()
+                    wait: float = max(
+                        self.paused_until - time.monotonic(),
+                        (1 - self.request_allowance) * 60 / self.requests_per_minute,
+                        (tokens - self.token_allowance) * 60 / self.tokens_per_minute)
+                    if wait <= 0:
+                        self.request_allowance -= 1
+                        self.token_allowance -= tokens
+                        return
+                    try:
+                        await asyncio.wait_for(self.condition.wait(), wait)
+                    except TimeoutError:
+                        pass
+            finally:
+                # Also runs when the caller is cancelled, so the line moves on
+                self.waiting.remove(entry)
+                heapq.heapify(self.waiting)
+                self.condition.notify_all()
+
+    def retry_delay(self, error: Exception, attempt: int) -> Optional[float]:
+        """Seconds to wait before retrying after error, or None if it isn't retryable"""
+        import anthropic  # Already loaded: there is a client
+
+        if isinstance(error, anthropic.APIStatusError):
+            if error.status_code not in self.RETRYABLE_STATUS:
+                return None
+            retry_after: Optional[str] = error.response.headers.get("retry-after")
+            if retry_after:
+                try:
+                    seconds: float = float(retry_after)
+                except ValueError:
+                    seconds = 0.0
+                if seconds > 0:
+                    # The server asked everyone to back off, not just this call
+                    self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+                    return seconds
+        elif not isinstance(error, anthropic.APIConnectionError):
+            return None
+
+        # Full jitter: anywhere up to the exponential cap
+        return random.uniform(0, min(RETRY_MAX_DELAY_S, RETRY_BASE_DELAY_S * 2 ** attempt))
+
+    async def run(self, call: Callable[[], Awaitable[Any]], priority: int = PRIORITY_INTERACTIVE,
+                  tokens: int = 0) -> Any:
+        """Await call() under the rate limits, retrying transient failures"""
+        attempt: int = 0
+        while True:
+            await self.acquire(priority, tokens)
+            try:
+                async with self.slots:
+                    return await call()
+            except Exception as e:
+                delay: Optional[float] = self.retry_delay(e, attempt)
+                if delay is None or attempt >= self.max_retries:
+                    raise
+            attempt += 1
+            await asyncio.sleep(delay)
+
+
+class AsyncRuntime:
+    """Background asyncio event loop that runs every agent call
+
+    Tk owns the main thread, so the loop gets a thread of its own. Work is
+    handed over as coroutines with submit(); results come back to the UI
+    through the UIDispatcher like any other off-thread update.
+    """
+
+    def __init__(self) -> None:
+        self.loop: asyncio.AbstractEventLoop = asyncio.new_event_loop()
+        self.thread: Thread = Thread(target=self.loop.run_forever, name="agent-runtime", daemon=True)
+
+    def start(self) -> None:
+        """Start the event loop thread"""
+        self.thread.start()
+
+    def submit(self, coroutine: Coroutine[Any, Any, Any]) -> Future:
+        """Schedule a coroutine on the loop; safe to call from any thread"""
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+    def stop(self, timeout: float = 5.0, drain: bool = False) -> None:
+        """Cancel outstanding work and stop the loop
+
+        With drain, outstanding work first gets up to timeout seconds to
+        finish, so background work such as summaries isn't lost on exit.
+        """
+        if not self.thread.is_alive():
+            return
+
+        async def cancel_all() -> None:
+            def outstanding() -> List[asyncio.Task]:
+                return [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+
+            if drain:
+                # Finished work can start more (a reply starts a summary), so look again
+                deadline: float = self.loop.time() + timeout
+                while outstanding() and self.loop.time() < deadline:
+                    await asyncio.wait(outstanding(), timeout=deadline - self.loop.time())
+            tasks: List[asyncio.Task] = outstanding()
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        try:
+            self.submit(cancel_all()).result(timeout * 2 if drain else timeout)
+        except Exception:
+            traceback.print_exc()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout)
+
+
+# Agent definitions
+AGENTS: Dict[str, Dict[str, str]] = {
+    "spark": {
+        "name": "Spark ✨",
+        "color": "#FF6B6B",
+        "role": "Motivator",
+        "system_prompt": """You are Spark, an ADHD-friendly motivational coach and emotional support agent.
+
+Your personality:
+- Warm, enthusiastic, but never overwhelming
+- Deeply understands ADHD patterns and challenges
+- Celebrates all wins, especially tiny ones
+- Non-judgmental about abandonment or restarts
+- Asks powerful "why" questions to capture meaning
+
+Your core responsibilities:
+1. Keep enthusiasm alive during projects
+2. Break overwhelming ideas into dopamine-generating micro-tasks
+3. Remind about the "why" behind projects (without guilt)
+4. Notice abandonment patterns early and gently check in
+5. Capture context and meaning before they vanish
+6. Create emotional safety for experimentation
+
+Communication style:
+- Short, energizing messages (ADHD-friendly)
+- Use emojis sparingly but meaningfully
+- Acknowledge feelings before suggesting actions
+- Frame challenges as adventures, not failures
+- End with hope and possibility
+
+Remember: You're not here to fix them. You're here to champion them."""
+    },
+    "proto": {
+        "name": "Proto 🎯",
+        "color": "#4ECDC4",
+        "role": "Executor",
+        "system_prompt": """You are Proto, a strategic executor and implementation specialist who understands ADHD.
+
+Your personality:
+- Pragmatic, clear, and action-oriented
+- Patient with context switching and restarts
+- Systematic but flexible
+- Tracks progress without judgment
+- Creates structure that supports, not constrains
+
+Your core responsibilities:
+1. Transform vague ideas into concrete, tiny actionable steps
+2. Create perfect "resume points" for when context switches happen
+3. Track what's been accomplished (celebrate progress)
+4. Suggest THE SINGLE most important next action
+5. Adapt plans when priorities or energy levels change
+6. Notice when someone is stuck and suggest alternatives
+
+Communication style:
+- Ultra-clear, numbered steps
+- One primary action at a time (avoid overwhelm)
+- Include time estimates (be realistic)
+- Provide "exit points" (places to pause guilt-free)
+- Use "we" language (you're on the team)
+- Always include "where we are" context
+
+When you give the user new steps to take, end your reply with them between
+a [TASKS] line and a [/TASKS] line, one numbered step per line with its time
+estimate. They are added to the user's task list, so only list new, concrete
+actions there: no exit points, options or recaps of steps given before.
+
+Remember: Done is better than perfect. Momentum beats perfection."""
+    }
+}
+
+
+CONTEXT_RECOVERY_PROMPT: str = ("I'm returning to this project. Can you give me a quick summary of where "
+                                "we are and what the single most important next action is?")
+
+
+class TrioCore:
+    """The team without a face: projects, conversations and agent calls
+
+    UI front ends subclass this and override the display hooks
+    (display_message, update_status, show_error, set_busy and the
+    *_stream methods); the defaults do nothing, apart from show_error,
+    which prints to stderr.
+    """
+
+    def __init__(self, warm_up: bool = True) -> None:
+        # Opt-in tracing, e.g. TRIO_TRACE=1 to write trio_trace.json from the start
+        trace_path: str = os.environ.get(TRACE_ENV, "")
+        if trace_path:
+            TRACER.start(TRACE_FILE if trace_path == "1" else trace_path)
+
+        # Database access layer; opening it is quick, the schema work is in warm_up()
+        self.db: Database = Database(DB_NAME)
+
+        # Load configuration
+        self.config: Dict[str, Any] = self.load_config()
+
+        # Cache for replies to deterministic prompts such as context recovery
+        self.response_cache: ResponseCache = ResponseCache(
+            self.db,
+            ttl_seconds=self.config["response_cache_ttl_hours"] * 3600,
+            max_entries=self.config["response_cache_max_entries"])
+
+        # Agent calls run as coroutines on a background event loop, and all of
+        # them go through the scheduler for rate limiting and retries
+        self.runtime: AsyncRuntime = AsyncRuntime()
+        self.runtime.start()
+        self.scheduler: RequestScheduler = RequestScheduler(
+            self.config["requests_per_minute"],
+            self.config["input_tokens_per_minute"],
+            self.config["max_retries"],
+            self.config["max_concurrent_requests"])
+
+        # Agent definitions
+        self.agents: Dict[str, Dict[str, str]] = AGENTS
+
+        # Claude client, created by warm_up()
+        self.client: Optional["anthropic.AsyncAnthropic"] = None
+        self.ready: Event = Event()
+
+        # Current project
+        self.current_project_id: Optional[int] = None
+
+        # In-flight chat requests per agent, so they can be stopped
+        self.request_lock: Lock = Lock()
+        self.active_requests: Dict[str, List[RequestHandle]] = {}
+
+        # (project_id, agent) pairs with a summary update in flight
+        self.summary_lock: Lock = Lock()
+        self.summarizing: set = set()
+
+        # Running token totals from response usage, including prompt cache hits/misses
+        self.usage_lock: Lock = Lock()
+        self.usage_totals: Dict[str, int] = {
+            "input_tokens": 0,
+            "output_tokens": 0,
+            "cache_read_input_tokens": 0,
+            "cache_creation_input_tokens": 0
+        }
+
+        if warm_up:
+            self.warm_up()
+
+    def warm_up(self) -> None:
+        """Slow startup work: schema checks and migrations, then the SDK and client
+
+        Runs from __init__ unless warm_up=False is passed, in which case
+        the front end calls it (for instance on a background thread, so its
+        window can appear first) and keeps anything that needs the schema or
+        the client off until the ready event is set.
+        """
+        self.init_database()
+        self.init_claude_client()
+        self.ready.set()
+
+    def init_database(self) -> None:
+        """Create missing tables and run pending migrations"""
+        with self.db.transaction() as cursor:
+            self.create_tables(cursor)
+
+        # Schema changes are quick and run now; large-table backfills run in the background
+        backfills: List[Backfill] = self.db.migrate(MIGRATIONS)
+        if backfills:
+            Thread(target=self.db.run_backfills, args=(backfills,), daemon=True).start()
+
+    def create_tables(self, cursor: sqlite3.Cursor) -> None:
+        """Create any missing tables"""
+        # Projects table
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS projects (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                title TEXT NOT NULL,
+                description TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                last_activity TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                status TEXT DEFAULT 'active',
+                initial_enthusiasm INTEGER DEFAULT 10,
+                abandonment_count INTEGER DEFAULT 0
+            )
+        ''')
+        
+        # Conversations table
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS conversations (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                project_id INTEGER,
+                agent TEXT NOT NULL,
+                message TEXT NOT NULL,
+                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                context_snapshot TEXT,
+                FOREIGN KEY (project_id) REFERENCES projects (id)
+            )
+        ''')
+        
+        # Tasks table
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS tasks (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                project_id INTEGER,
+                description TEXT NOT NULL,
+                size TEXT DEFAULT 'tiny',
+                completed BOOLEAN DEFAULT 0,
+                completed_at TIMESTAMP,
+                dopamine_score INTEGER,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (project_id) REFERENCES projects (id)
+            )
+        ''')
+        
+        # Insights table
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS insights (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                project_id INTEGER,
+                insight_type TEXT NOT NULL,
+                content TEXT NOT NULL,
+                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (project_id) REFERENCES projects (id)
+            )
+        ''')
+
+        # Response cache table
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS response_cache (
+                cache_key TEXT PRIMARY KEY,
+                agent TEXT NOT NULL,
+                model TEXT NOT NULL,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL,
+                hits INTEGER DEFAULT 0
+            )
+        ''')
+        
+    def load_config(self) -> Dict[str, Any]:
+        """Load or create configuration"""
+        default_config: Dict[str, Any] = {
+            "anthropic_api_key": "",
+            "base_url": "",  # empty for the official API; set for a proxy or a local stub
+            "model": "claude-sonnet-4-5-20250929",
+            "max_tokens": 1024,
+            "theme": "light",
+            "streaming": True,
+            "prompt_caching": True,
+            "response_cache_ttl_hours": 24,
+            "response_cache_max_entries": 500,
+            "context_token_budget": 8000,
+            "summary_trigger_tokens": 6000,
+            "summary_keep_tokens": 2000,
+            "summary_max_tokens": 600,
+            "requests_per_minute": 50,
+            "input_tokens_per_minute": 30000,
+            "max_retries": 5,
+            "max_concurrent_requests": 4,
+            "latest_wins": True,
+            "team_rebuttal": False,
+            # US dollars per million tokens, for the Performance window's cost column
+            "price_per_mtok": {"input": 3.0, "output": 15.0, "cache_read": 0.3, "cache_write": 3.75}
+        }
+        
+        if os.path.exists(CONFIG_FILE):
+            with open(CONFIG_FILE, 'r') as f:
+                return {**default_config, **json.load(f)}
+        else:
+            # Create default config
+            with open(CONFIG_FILE, 'w') as f:
+                json.dump(default_config, f, indent=2)
+            return default_config
+    
+    def save_config(self) -> None:
+        """Save configuration to file"""
+        with open(CONFIG_FILE, 'w') as f:
+            json.dump(self.config, f, indent=2)
+
+    def init_claude_client(self) -> None:
+        """Initialize Claude API client"""
+        api_key: str = self.config.get("anthropic_api_key", "")
+        if api_key and api_key != "":
+            try:
+                import anthropic
+
+                # Retries are handled by the request scheduler
+                self.client = anthropic.AsyncAnthropic(api_key=api_key, max_retries=0,
+                                                       base_url=self.config.get("base_url") or None)
+            except Exception as e:
+                self.show_error("API Error", f"Failed to initialize Claude client: {str(e)}")
+
+    # Display hooks, overridden by front ends. Agent calls run on the runtime
+    # thread, so overrides must be safe to call from it.
+
+    def display_message(self, agent_id: str, sender: str, message: str, tag: str) -> None:
+        """Show a complete message in an agent's conversation"""
+
+    def update_status(self, message: str) -> None:
+        """Report what the team is doing"""
+
+    def show_error(self, title: str, message: str) -> None:
+        """Report an error"""
+        print(f"{title}: {message}", file=sys.stderr)
+
+    def set_busy(self, agent_id: str, busy: bool) -> None:
+        """Report whether an agent has chat requests in flight"""
+
+    def begin_stream(self, display_id: str, sender: str, tag: str) -> str:
+        """Start a streamed reply in a conversation and return its stream id"""
+        return display_id
+
+    def reset_stream(self, stream_id: str) -> None:
+        """Discard a streamed reply's text so far, before a retry"""
+
+    def append_stream(self, stream_id: str, text: str) -> None:
+        """Add a text delta to a streamed reply"""
+
+    def end_stream(self, stream_id: str) -> None:
+        """Finish a streamed reply"""
+
+    def stats_changed(self) -> None:
+        """Called after a write that changes the current project's stats"""
+
+    def tasks_changed(self) -> None:
+        """Called after new tasks are queued for the current project"""
+
+    def latest_project_id(self) -> Optional[int]:
+        """Id of the most recently active project, if there is one"""
+        result: Optional[Tuple[Any, ...]] = self.db.query_one(
+            'SELECT id FROM projects ORDER BY last_activity DESC LIMIT 1')
+        return result[0] if result else None
+
+    def create_project(self, title: str, description: str, enthusiasm: int) -> int:
+        """Create a project, make it current and introduce it to both agents"""
+        project_id: int = self.db.execute('''
+            INSERT INTO projects (title, description, initial_enthusiasm)
+            VALUES (?, ?, ?)
+        ''', (title, description, enthusiasm))
+        self.current_project_id = project_id
+
+        # Add initial conversation with both agents
+        welcome_msg = f"New project started: {title}"
+        self.save_conversation(project_id, "system", welcome_msg)
+
+        # Send intro to Spark
+        spark_intro = f"""A new project has started! 
+
+Title: {title}
+Description: {description}
+Initial enthusiasm: {enthusiasm}/10
+
+Say hello and help capture the excitement and 'why' behind this project!"""
+
+        self.runtime.submit(self.send_to_agent(project_id, "spark", spark_intro, True, call_site="intro"))
+
+        # Send intro to Proto
+        proto_intro = f"""New project initiated:
+
+Title: {title}
+Description: {description}
+
+Help break this down into the first tiny actionable steps."""
+
+        self.runtime.submit(self.send_to_agent(project_id, "proto", proto_intro, True, call_site="intro"))
+        return project_id
+
+    def add_capture(self, content: str) -> None:
+        """Save a quick capture as an insight and pass it to Spark"""
+        self.db.submit('''
+            INSERT INTO insights (project_id, insight_type, content)
+            VALUES (?, ?, ?)
+        ''', (self.current_project_id, "capture", content))
+
+        # Send to Spark for processing
+        self.runtime.submit(self.send_to_agent(self.current_project_id, "spark", f"Quick capture: {content}", True,
+                                               call_site="capture"))
+
+    async def chat(self, project_id: Optional[int], agent_id: str, message: str,
+                   handle: Optional[RequestHandle] = None) -> None:
+        """Save a user message to an agent and get the agent's reply"""
+        self.save_conversation(project_id, "user", message)
+        self.update_project_activity(project_id)
+        await self.send_to_agent(project_id, agent_id, message, handle=handle)
+
+    def start_request(self, agent_id: str) -> RequestHandle:
+        """Register a new chat request for an agent
+
+        With the latest_wins setting, requests still in flight for the tab
+        are cancelled: their answers are to a message that's been followed up.
+        """
+        handle: RequestHandle = RequestHandle(agent_id)
+        with self.request_lock:
+            handles: List[RequestHandle] = self.active_requests.setdefault(agent_id, [])
+            if self.config.get("latest_wins", True):
+                for previous in handles:
+                    previous.cancel()
+            handles.append(handle)
+        self.set_busy(agent_id, True)
+        return handle
+
+    def finish_request(self, handle: RequestHandle) -> None:
+        """Forget a finished (or cancelled) chat request"""
+        with self.request_lock:
+            handles: List[RequestHandle] = self.active_requests.get(handle.agent_id, [])
+            if handle in handles:
+                handles.remove(handle)
+            busy: bool = bool(handles)
+        self.set_busy(handle.agent_id, busy)
+
+    def stop_requests(self, agent_id: str) -> None:
+        """Cancel every in-flight chat request for an agent"""
+        with self.request_lock:
+            handles: List[RequestHandle] = list(self.active_requests.get(agent_id, []))
+        for handle in handles:
+            handle.cancel()
+
+    async def send_to_agent(self, project_id: Optional[int], agent_id: str, message: str, auto: bool = False,
+                      cacheable: bool = False, bypass_cache: bool = False,
+                      handle: Optional[RequestHandle] = None, call_site: str = "chat") -> None:
+        """Send message to agent and get response
+
+        Everything is read from and saved to project_id, the project that
+        was open when the request was made, even if another one is open by
+        the time the reply arrives. Cacheable prompts are answered from the
+        response cache when the project's history hasn't changed since the
+        last answer, unless bypass_cache is set. Cancelling the handle discards the reply, so
+        nothing partial or superseded is saved.
+        """
+        try:
+            # Get agent info
+            agent: Dict[str, str] = self.agents[agent_id]
+
+            # Build messages array from conversation history plus the current message;
+            # it can wait on the write-behind queue, so keep it off the event loop
+            messages: List[Dict[str, Any]] = await asyncio.to_thread(self.build_messages, project_id, agent_id, message)
+
+            if cacheable and not bypass_cache:
+                cached: Optional[str] = await asyncio.to_thread(self.response_cache.get, ResponseCache.make_key(
+                    agent_id, self.config["model"], agent["system_prompt"], messages))
+                if cached is not None:
+                    if not auto:
+                        self.display_message(agent_id, f"{agent['name']} (cached)", cached, "agent")
+                    self.update_status("Ready")
+                    return
+            
+            # Update status
+            self.update_status(f"Asking {agent['name']}...")
+            
+            # Call Claude API, streaming into the agent's tab unless this is an auto
+            # message; auto messages (intros, captures) wait behind interactive ones
+            response_text: str = await self.request_reply(project_id, agent_id, messages,
+                                                    display_id=None if auto else agent_id,
+                                                    sender=agent["name"], tag="agent",
+                                                    priority=PRIORITY_BACKGROUND if auto else PRIORITY_INTERACTIVE,
+                                                    call_site=call_site)
+            
+            # Save to database
+            self.save_conversation(project_id, agent_id, response_text)
+            self.maybe_summarize(project_id, agent_id)
+            if agent_id == TASK_AGENT and call_site in TASK_CALL_SITES:
+                self.save_tasks(project_id, response_text)
+
+            # Key the cache on the history as it stands now that the reply is saved,
+            # so asking again before anything else changes is a hit
+            if cacheable:
+                saved: List[Dict[str, Any]] = await asyncio.to_thread(self.build_messages, project_id, agent_id, message)
+                await asyncio.to_thread(
+                    self.response_cache.put,
+                    ResponseCache.make_key(agent_id, self.config["model"], agent["system_prompt"], saved),
+                    agent_id, self.config["model"], response_text)
+            
+            # Update status
+            self.update_status("Ready")
+
+        except asyncio.CancelledError:
+            self.update_status(f"Stopped {agent['name']}")
+            raise
+            
+        except Exception as e:
+            error_msg: str = f"Error communicating with {agent['name']}: {str(e)}"
+            self.show_error("API Error", error_msg)
+            self.update_status("Error - Check your API key")
+
+        finally:
+            if handle is not None:
+                self.finish_request(handle)
+
+    def build_messages(self, project_id: Optional[int], agent_id: str, message: str) -> List[Dict[str, Any]]:
+        """Build the messages array from recent history plus a new user message
+
+        The agent's rolling summary (if any) comes first, then the newest
+        rows after it are packed until the context_token_budget is spent.
+        Consecutive turns from the same role are merged, since the API
+        requires user and assistant turns to alternate.
+        """
+        budget: int = self.config["context_token_budget"] - estimate_tokens(message)
+        history: List[Tuple[Any, ...]] = []
+        before_id: Optional[int] = None
+        full: bool = False
+
+        summary: Optional[Tuple[Any, ...]] = self.get_summary(project_id, agent_id)
+        through_id: int = 0
+        if summary:
+            through_id = summary[1]
+            budget -= summary[2]
+
+        while not full:
+            page: List[Tuple[Any, ...]] = self.get_conversation_history(
+                project_id, agent_id, limit=CONTEXT_PAGE_SIZE, before_id=before_id)
+            if not page:
+                break
+
+            for row in reversed(page):
+                # A chat message is saved before it is sent; don't include it twice
+                if not history and before_id is None and row[1] == "user" and row[2] == message:
+                    continue
+                tokens: int = row[4] if row[4] is not None else estimate_tokens(row[2])
+                if row[3] <= through_id or tokens > budget:
+                    full = True
+                    break
+                budget -= tokens
+                history.append(row)
+            before_id = page[0][3]
+
+        messages: List[Dict[str, Any]] = []
+        if summary:
+            messages.append({"role": "user",
+                             "content": f"Summary of our earlier conversation on this project:\n{summary[0]}"})
+        for msg in reversed(history):
+            role: str = "user" if msg[1] == "user" else "assistant"
+            if messages and messages[-1]["role"] == role:
+                messages[-1]["content"] += "\n\n" + msg[2]
+            elif messages or role == "user":
+                messages.append({"role": role, "content": msg[2]})
+
+        if messages and messages[-1]["role"] == "user":
+            messages[-1]["content"] += "\n\n" + message
+        else:
+            messages.append({"role": "user", "content": message})
+        return messages
+
+    def get_summary(self, project_id: Optional[int], agent_id: str) -> Optional[Tuple[Any, ...]]:
+        """Get an agent's rolling summary as (summary, through_id, token_count)"""
+        return self.db.query_one('''
+            SELECT summary, through_id, token_count FROM conversation_summaries
+            WHERE project_id = ? AND agent = ?
+        ''', (project_id, agent_id))
+
+    def maybe_summarize(self, project_id: Optional[int], agent_id: str) -> None:
+        """Start a background summary update for this agent unless one is running"""
+        key: Tuple[Optional[int], str] = (project_id, agent_id)
+        with self.summary_lock:
+            if key in self.summarizing:
+                return
+            self.summarizing.add(key)
+        self.runtime.submit(self.update_summary(project_id, agent_id))
+
+    def summary_fold_end(self, project_id: Optional[int], agent_id: str, through_id: int) -> int:
+        """Id of the newest turn to fold into the summary, or 0 if it isn't time yet
+
+        It's time once the turns after through_id pass summary_trigger_tokens;
+        then everything but the newest summary_keep_tokens worth is folded.
+        Reads only a token sum and the kept turns, not the whole history.
+        """
+        self.db.flush()
+        with self.db.reader() as conn:
+            total: int = conn.execute(f'''
+                SELECT IFNULL(SUM(IFNULL(token_count, {ESTIMATE_TOKENS_SQL})), 0) FROM conversations
+                WHERE project_id = ? AND agent IN (?, 'user') AND id > ?
+            ''', (project_id, agent_id, through_id)).fetchone()[0]
+            if total <= self.config["summary_trigger_tokens"]:
+                return 0
+
+            # Walk back from the newest turn; the first one that doesn't fit is the last to fold
+            kept: int = 0
+            for row_id, tokens in conn.execute(f'''
+                SELECT id, IFNULL(token_count, {ESTIMATE_TOKENS_SQL}) FROM conversations
+                WHERE project_id = ? AND agent IN (?, 'user') AND id > ?
+                ORDER BY id DESC
+            ''', (project_id, agent_id, through_id)):
+                if kept + tokens > self.config["summary_keep_tokens"]:
+                    return row_id
+                kept += tokens
+        return 0
+
+    def summary_chunk(self, project_id: Optional[int], agent_id: str, after_id: int,
+                      fold_end: int) -> List[Tuple[Any, ...]]:
+        """The next (id, agent, message) turns to fold, up to summary_trigger_tokens worth
+
+        Always returns at least one turn while there are any; one longer than
+        the whole budget is cut short.
+        """
+        budget: int = self.config["summary_trigger_tokens"]
+        chunk: List[Tuple[Any, ...]] = []
+        used: int = 0
+        with self.db.reader() as conn:
+            for row_id, agent, message, tokens in conn.execute(f'''
+                SELECT id, agent, message, IFNULL(token_count, {ESTIMATE_TOKENS_SQL}) FROM conversations
+                WHERE project_id = ? AND agent IN (?, 'user') AND id > ? AND id <= ?
+                ORDER BY id
+            ''', (project_id, agent_id, after_id, fold_end)):
+                if chunk and used + tokens > budget:
+                    break
+                if tokens > budget:
+                    message = message[:budget * 4] + " [...]"
+                chunk.append((row_id, agent, message))
+                used += min(tokens, budget)
+        return chunk
+
+    async def update_summary(self, project_id: Optional[int], agent_id: str) -> None:
+        """Fold older turns into the agent's rolling summary once history grows
+
+        Runs in the background. When the turns after the current summary pass
+        summary_trigger_tokens, all but the newest summary_keep_tokens worth
+        are folded into the summary, so the context stays about the same size
+        however long the project runs. Turns are folded oldest first, at most
+        summary_trigger_tokens per call, and the summary is saved after each
+        call, so a long history that was never summarized catches up in
+        bounded requests and a failure only repeats the chunk that failed.
+        """
+        try:
+            summary: Optional[Tuple[Any, ...]] = await asyncio.to_thread(self.get_summary, project_id, agent_id)
+            text: Optional[str] = summary[0] if summary else None
+            through_id: int = summary[1] if summary else 0
+
+            fold_end: int = await asyncio.to_thread(self.summary_fold_end, project_id, agent_id, through_id)
+            agent: Dict[str, str] = self.agents[agent_id]
+            while through_id < fold_end:
+                fold: List[Tuple[Any, ...]] = await asyncio.to_thread(
+                    self.summary_chunk, project_id, agent_id, through_id, fold_end)
+                if not fold:
+                    return
+
+                transcript: str = "\n\n".join(
+                    f"{'User' if row[1] == 'user' else agent['name']}: {row[2]}" for row in fold)
+                prompt: str = (f"Current summary:\n{text or '(none yet)'}\n\n"
+                               f"New conversation turns to fold in:\n{transcript}\n\n"
+                               f"Write the updated summary.")
+                started: float = time.perf_counter()
+                try:
+                    response = await self.scheduler.run(lambda: self.client.messages.create(
+                        model=self.config["model"],
+                        max_tokens=self.config["summary_max_tokens"],
+                        system=f"You keep a running summary of a conversation between a user with ADHD and "
+                               f"their AI teammate {agent['name']} ({agent['role']}). Preserve the project's "
+                               f"goals and 'why', decisions made, progress and completed steps, open tasks, "
+                               f"where they left off, and how the user was feeling. Be concise; write plain "
+                               f"short paragraphs or bullets.",
+                        messages=[{"role": "user", "content": prompt}]
+                    ), PRIORITY_BACKGROUND, estimate_tokens(prompt))
+                except (asyncio.CancelledError, Exception) as e:
+                    self.record_api_call(project_id, agent_id, "summary", self.config["model"], False, started, error=e)
+                    raise
+                self.record_api_call(project_id, agent_id, "summary", self.config["model"], False, started,
+                                     usage=response.usage)
+
+                text = response.content[0].text
+                through_id = fold[-1][0]
+                await asyncio.to_thread(self.db.execute, '''
+                    INSERT OR REPLACE INTO conversation_summaries
+                        (project_id, agent, summary, through_id, token_count, updated_at)
+                    VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+                ''', (project_id, agent_id, text, through_id, estimate_tokens(text)))
+        except Exception:
+            # Summaries are an optimization; the next reply will try again
+            traceback.print_exc()
+        finally:
+            with self.summary_lock:
+                self.summarizing.discard((project_id, agent_id))
+
+    async def team_discussion(self, project_id: Optional[int], message: str, rebuttal: bool = False) -> None:
+        """Facilitate team discussion between agents
+
+        Both agents are asked in parallel, so a team turn takes about as long
+        as the slower of the two calls. When rebuttal is set, Proto gets a
+        follow-up round to respond to Spark's perspective. Replies are saved
+        to project_id even if another project is opened meanwhile.
+        """
+        try:
+            self.save_conversation(project_id, "user", f"[TEAM] {message}")
+            self.update_status("Asking the team...")
+            prompts: Dict[str, str] = {
+                "spark": f"In a team discussion, the user asked: {message}\n\nProvide your perspective as the Motivator.",
+                "proto": f"In a team discussion, the user asked: {message}\n\nProvide your perspective as the Executor."
+            }
+            responses: Dict[str, str] = {}
+
+            async def perspective(agent_id: str, prompt: str) -> Tuple[str, str]:
+                return agent_id, await self.get_agent_response(project_id, agent_id, prompt, "team")
+
+            # Each perspective streams into the team pane; save them as they finish
+            for next_reply in asyncio.as_completed([perspective(agent_id, prompt)
+                                                    for agent_id, prompt in prompts.items()]):
+                agent_id, responses[agent_id] = await next_reply
+                self.save_conversation(project_id, agent_id, f"[TEAM] {responses[agent_id]}")
+                self.maybe_summarize(project_id, agent_id)
+
+            if rebuttal:
+                self.update_status("Proto is responding to Spark...")
+                follow_up: str = await self.get_agent_response(project_id, "proto",
+                    f"In a team discussion, the user asked: {message}\n\nYour perspective: {responses['proto']}\n\nSpark's perspective: {responses['spark']}\n\nRespond briefly to Spark's perspective as the Executor.",
+                    "team", sender=f"{self.agents['proto']['name']} (follow-up)")
+
+                self.save_conversation(project_id, "proto", f"[TEAM] {follow_up}")
+
+            self.update_status("Ready")
+            
+        except Exception as e:
+            self.show_error("Error", f"Team discussion error: {str(e)}")
+            self.update_status("Error")
+
+    async def get_agent_response(self, project_id: Optional[int], agent_id: str, message: str,
+                                 display_id: Optional[str] = None, sender: Optional[str] = None,
+                                 call_site: str = "team") -> str:
+        """Get response from agent (helper method)"""
+        return await self.request_reply(project_id, agent_id, [{"role": "user", "content": message}],
+                                  display_id=display_id, sender=sender, tag=agent_id, call_site=call_site)
+
+    async def request_reply(self, project_id: Optional[int], agent_id: str, messages: List[Dict[str, Any]],
+                            display_id: Optional[str] = None, sender: Optional[str] = None,
+                            tag: str = "agent", priority: int = PRIORITY_INTERACTIVE,
+                            call_site: str = "chat") -> str:
+        """Call Claude for an agent and return the full reply text
+
+        With a display_id the reply is shown in that chat pane, streamed token
+        by token when streaming is enabled in the config. The call goes
+        through the request scheduler in the given priority lane. If the
+        coroutine is cancelled, any streamed text is left marked as stopped.
+        Every call is recorded in api_calls under project_id and call_site.
+        """
+        agent: Dict[str, str] = self.agents[agent_id]
+        sender = sender or agent["name"]
+        request: Dict[str, Any] = self.build_request(agent, messages)
+        tokens: int = estimate_tokens(agent["system_prompt"]) + sum(
+            estimate_tokens(message["content"]) for message in messages)
+        started: float = time.perf_counter()
+
+        if display_id is None or not self.config.get("streaming", True):
+            try:
+                response = await self.scheduler.run(lambda: self.client.messages.create(**request),
+                                                    priority, tokens)
+            except (asyncio.CancelledError, Exception) as e:
+                self.record_api_call(project_id, agent_id, call_site, request["model"], False, started, error=e)
+                raise
+            self.record_api_call(project_id, agent_id, call_site, request["model"], False, started, usage=response.usage)
+            response_text: str = response.content[0].text
+            if display_id is not None:
+                self.display_message(display_id, sender, response_text, tag)
+            return response_text
+
+        stream_id: str = self.begin_stream(display_id, sender, tag)
+        first_token: Optional[float] = None
+
+        async def stream_reply() -> Any:
+            nonlocal first_token
+            # A retry starts the reply over, so drop anything a failed attempt showed
+            self.reset_stream(stream_id)
+            async with self.client.messages.stream(**request) as stream:
+                async for text in stream.text_stream:
+                    if first_token is None:
+                        first_token = time.perf_counter()
+                    self.append_stream(stream_id, text)
+                return await stream.get_final_message()
+
+        try:
+            final_message = await self.scheduler.run(stream_reply, priority, tokens)
+            self.record_api_call(project_id, agent_id, call_site, request["model"], True, started, first_token,
+                                 usage=final_message.usage)
+            return "".join(block.text for block in final_message.content if block.type == "text")
+        except asyncio.CancelledError as e:
+            self.record_api_call(project_id, agent_id, call_site, request["model"], True, started, first_token, error=e)
+            self.append_stream(stream_id, " ⏹ (stopped)")
+            raise
+        except Exception as e:
+            self.record_api_call(project_id, agent_id, call_site, request["model"], True, started, first_token, error=e)
+            raise
+        finally:
+            self.end_stream(stream_id)
+
+    def build_request(self, agent: Dict[str, str], messages: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Build Messages API arguments, with prompt-cache breakpoints when enabled
+
+        The system prompt never changes, and the history before the newest
+        message is identical on the next turn, so both get a cache breakpoint.
+        """
+        request: Dict[str, Any] = {
+            "model": self.config["model"],
+            "max_tokens": self.config["max_tokens"],
+            "system": agent["system_prompt"],
+            "messages": messages
+        }
+        if not self.config.get("prompt_caching", True):
+            return request
+
+        request["system"] = [{
+            "type": "text",
+            "text": agent["system_prompt"],
+            "cache_control": {"type": "ephemeral"}
+        }]
+        if len(messages) > 1:
+            prefix_end: Dict[str, Any] = messages[-2]
+            request["messages"] = messages[:-2] + [{
+                "role": prefix_end["role"],
+                "content": [{
+                    "type": "text",
+                    "text": prefix_end["content"],
+                    "cache_control": {"type": "ephemeral"}
+                }]
+            }, messages[-1]]
+        return request
+
+    def record_usage(self, usage: Any) -> None:
+        """Add a response's token usage (cache reads are hits, cache creation misses)"""
+        with self.usage_lock:
+            for key in self.usage_totals:
+                self.usage_totals[key] += getattr(usage, key, None) or 0
+
+    def record_api_call(self, project_id: Optional[int], agent_id: str, call_site: str, model: str,
+                        streamed: bool, started: float, first_token: Optional[float] = None, usage: Any = None,
+                        error: Optional[BaseException] = None) -> None:
+        """Queue an api_calls row for a finished, failed or cancelled call
+
+        Latency runs from when the call was requested, so it includes time
+        queued in the scheduler and any retries; started and first_token are
+        time.perf_counter() readings.
+        """
+        now: float = time.perf_counter()
+        if usage is not None:
+            self.record_usage(usage)
+        counts: Dict[str, int] = {key: getattr(usage, key, None) or 0 for key in (
+            "input_tokens", "output_tokens", "cache_read_input_tokens", "cache_creation_input_tokens")}
+        price: Dict[str, float] = self.config["price_per_mtok"]
+        cost: float = (counts["input_tokens"] * price.get("input", 0)
+                       + counts["output_tokens"] * price.get("output", 0)
+                       + counts["cache_read_input_tokens"] * price.get("cache_read", 0)
+                       + counts["cache_creation_input_tokens"] * price.get("cache_write", 0)) / 1_000_000
+        status: str = ("ok" if error is None else
+                       "cancelled" if isinstance(error, asyncio.CancelledError) else type(error).__name__)
+
+        TRACER.interval(f"{call_site} {agent_id}", "api", started, now, {"model": model, "status": status},
+                        {"first token": first_token} if first_token is not None else None)
+
+        self.db.submit('''
+            INSERT INTO api_calls (project_id, agent, call_site, model, streamed, status, ttft_ms, latency_ms,
+                                   input_tokens, output_tokens, cache_read_tokens, cache_write_tokens, cost_usd)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (project_id, agent_id, call_site, model, int(streamed), status,
+              round((first_token - started) * 1000, 1) if first_token is not None else None,
+              round((now - started) * 1000, 1),
+              counts["input_tokens"], counts["output_tokens"], counts["cache_read_input_tokens"],
+              counts["cache_creation_input_tokens"], cost))
+
+    def save_conversation(self, project_id: Optional[int], agent: str, message: str) -> None:
+        """Queue a conversation row for the next group commit"""
+        self.db.submit('''
+            INSERT INTO conversations (project_id, agent, message, token_count)
+            VALUES (?, ?, ?, ?)
+        ''', (project_id, agent, message, estimate_tokens(message)))
+        self.stats_changed()
+
+    def get_conversation_history(self, project_id: Optional[int], agent_id: str, limit: int = 10,
+                                 before_id: Optional[int] = None) -> List[Tuple[Any, ...]]:
+        """Get conversation history
+
+        Returns (timestamp, agent, message, id, token_count) rows, oldest
+        first. Rows are ordered by id, which is monotonic even for messages
+        saved in the same second; pass the oldest id of one page as before_id
+        to fetch the page before it. Each branch of the UNION is a bounded
+        backwards scan of idx_conversations_project_agent.
+        """
+        before: int = before_id if before_id is not None else sys.maxsize
+        self.db.flush()
+        rows: List[Tuple[Any, ...]] = self.db.query('''
+            SELECT timestamp, agent, message, id, token_count FROM (
+                SELECT * FROM (
+                    SELECT id, timestamp, agent, message, token_count FROM conversations
+                    WHERE project_id = ? AND agent = ? AND id < ?
+                    ORDER BY id DESC LIMIT ?
+                )
+                UNION ALL
+                SELECT * FROM (
+                    SELECT id, timestamp, agent, message, token_count FROM conversations
+                    WHERE project_id = ? AND agent = 'user' AND id < ?
+                    ORDER BY id DESC LIMIT ?
+                )
+                ORDER BY id DESC
+                LIMIT ?
+            )
+        ''', (project_id, agent_id, before, limit, project_id, before, limit, limit))
+
+        return list(reversed(rows))
+
+    def search_history(self, query: str, project_id: Optional[int] = None,
+                       limit: int = 50) -> List[Tuple[Any, ...]]:
+        """Full-text search over conversations and insights, best matches first
+
+        Returns (kind, id, project_id, source, snippet, timestamp) rows, where
+        kind is 'conversation' or 'insight' and source is the agent or insight
+        type. Matches in the snippet are wrapped in SEARCH_MATCH_START/END.
+        """
+        # Quote each word so punctuation can't break FTS syntax (the porter
+        # tokenizer still matches other forms of each word)
+        words: List[str] = ['"' + word.replace('"', '""') + '"' for word in query.split()]
+        if not words:
+            return []
+        match: str = " ".join(words)
+
+        project_filter: str = "AND project_id = ?" if project_id is not None else ""
+        project_params: Tuple[Any, ...] = (project_id,) if project_id is not None else ()
+
+        # Each branch lets FTS5 pick its top matches by rank before the merge,
+        # so snippets are only built for rows that can make the final list
+        self.db.flush()
+        return self.db.query(f'''
+            SELECT kind, id, project_id, source, snippet, timestamp FROM (
+                SELECT * FROM (
+                    SELECT 'conversation' AS kind, c.id, c.project_id, c.agent AS source,
+                           snippet(conversations_fts, 0, ?, ?, '…', 16) AS snippet,
+                           c.timestamp, conversations_fts.rank AS rank
+                    FROM conversations_fts JOIN conversations c ON c.id = conversations_fts.rowid
+                    WHERE conversations_fts MATCH ? {project_filter}
+                    ORDER BY conversations_fts.rank LIMIT ?
+                )
+                UNION ALL
+                SELECT * FROM (
+                    SELECT 'insight', i.id, i.project_id, i.insight_type,
+                           snippet(insights_fts, 0, ?, ?, '…', 16),
+                           i.timestamp, insights_fts.rank
+                    FROM insights_fts JOIN insights i ON i.id = insights_fts.rowid
+                    WHERE insights_fts MATCH ? {project_filter}
+                    ORDER BY insights_fts.rank LIMIT ?
+                )
+            )
+            ORDER BY rank
+            LIMIT ?
+        ''', (SEARCH_MATCH_START, SEARCH_MATCH_END, match, *project_params, limit,
+              SEARCH_MATCH_START, SEARCH_MATCH_END, match, *project_params, limit, limit))
+
+    def update_project_activity(self, project_id: Optional[int]) -> None:
+        """Update last activity timestamp"""
+        if project_id:
+            self.db.submit('''
+                UPDATE projects
+                SET last_activity = CURRENT_TIMESTAMP
+                WHERE id = ?
+            ''', (project_id,))
+
+    def save_tasks(self, project_id: Optional[int], reply: str) -> None:
+        """Queue the steps in a reply's task blocks as tasks, skipping ones already open"""
+        tasks: List[Tuple[str, str]] = extract_tasks(reply)
+        if not project_id or not tasks:
+            return
+        for description, size in tasks:
+            self.db.submit('''
+                INSERT INTO tasks (project_id, description, size)
+                SELECT ?, ?, ?
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM tasks WHERE project_id = ? AND description = ? AND completed = 0
+                )
+            ''', (project_id, description, size, project_id, description))
+        self.stats_changed()
+        self.tasks_changed()
+
+    def get_open_tasks(self, project_id: int, after_id: int = 0) -> List[Tuple[Any, ...]]:
+        """Open (id, description, size) tasks oldest first, optionally only those newer than after_id
+
+        Served in order by idx_tasks_project_completed, whose entries end
+        with the rowid.
+        """
+        self.db.flush()
+        return self.db.query('''
+            SELECT id, description, size FROM tasks
+            WHERE project_id = ? AND completed = 0 AND id > ?
+            ORDER BY id
+        ''', (project_id, after_id))
+
+    def record_task_completion(self, task_id: int, dopamine_score: int) -> None:
+        """Queue a task's completion with how good it felt (1-10)"""
+        self.db.submit('''
+            UPDATE tasks SET completed = 1, completed_at = CURRENT_TIMESTAMP, dopamine_score = ?
+            WHERE id = ? AND completed = 0
+        ''', (dopamine_score, task_id))
+        self.stats_changed()
+
+    def get_project_stats(self, project_id: int) -> Dict[str, Any]:
+        """Counters for the stats panel, read from project_stats rather than counted"""
+        self.db.flush()
+        row: Optional[Tuple[Any, ...]] = self.db.query_one('''
+            SELECT (SELECT COUNT(*) FROM projects), message_count, open_task_count, completed_task_count,
+                   julianday('now') - julianday(first_message_at)
+            FROM (SELECT 1) LEFT JOIN project_stats ON project_id = ?
+        ''', (project_id,))
+        project_count, message_count, open_tasks, completed_tasks, age_days = row
+        message_count, open_tasks, completed_tasks = message_count or 0, open_tasks or 0, completed_tasks or 0
+        total_tasks: int = open_tasks + completed_tasks
+
+        return {
+            "project_count": project_count,
+            "message_count": message_count,
+            "open_task_count": open_tasks,
+            "completed_task_count": completed_tasks,
+            # Averaged over calendar days since the first message, today included
+            "messages_per_day": message_count / (int(age_days) + 1) if age_days is not None else 0.0,
+            "completion_rate": completed_tasks / total_tasks if total_tasks else None
+        }
+
+    def get_api_metrics(self, days: int = METRICS_WINDOW_DAYS) -> Dict[str, List[Dict[str, Any]]]:
+        """Summarize the last few days of api_calls
+
+        "calls" has latency percentiles per agent and call site; "days" has
+        call counts, tokens and cost per local calendar day, newest first.
+        Cancelled calls count towards tokens but not latency.
+        """
+        self.db.flush()
+        since: str = f"-{days} days"
+        with self.db.reader() as conn:
+            rows: List[Tuple[Any, ...]] = conn.execute('''
+                SELECT agent, call_site, status, ttft_ms, latency_ms, input_tokens + cache_read_tokens
+                       + cache_write_tokens, output_tokens, cost_usd
+                FROM api_calls WHERE created_at >= datetime('now', ?)
+                ORDER BY latency_ms
+            ''', (since,)).fetchall()
+            daily: List[Tuple[Any, ...]] = conn.execute('''
+                SELECT date(created_at, 'localtime') AS day, COUNT(*), SUM(status != 'ok'),
+                       SUM(input_tokens), SUM(output_tokens), SUM(cache_read_tokens), SUM(cache_write_tokens),
+                       SUM(cost_usd)
+                FROM api_calls WHERE created_at >= datetime('now', ?)
+                GROUP BY day ORDER BY day DESC
+            ''', (since,)).fetchall()
+
+        groups: Dict[Tuple[str, str], List[Tuple[Any, ...]]] = {}
+        for row in rows:
+            groups.setdefault((row[0], row[1]), []).append(row)
+
+        calls: List[Dict[str, Any]] = []
+        for (agent_id, call_site), group in sorted(groups.items()):
+            # Rows arrive sorted by latency, so each group's latencies are too
+            latencies: List[float] = [row[4] for row in group if row[2] == "ok"]
+            ttfts: List[float] = sorted(row[3] for row in group if row[2] == "ok" and row[3] is not None)
+            calls.append({
+                "agent": agent_id,
+                "call_site": call_site,
+                "calls": len(group),
+                "errors": sum(1 for row in group if row[2] not in ("ok", "cancelled")),
+                "p50_ms": percentile(latencies, 0.5),
+                "p95_ms": percentile(latencies, 0.95),
+                "ttft_p50_ms": percentile(ttfts, 0.5),
+                "ttft_p95_ms": percentile(ttfts, 0.95),
+                "input_tokens": sum(row[5] for row in group),
+                "output_tokens": sum(row[6] for row in group),
+                "cost_usd": sum(row[7] for row in group)
+            })
+
+        return {
+            "calls": calls,
+            "days": [dict(zip(("day", "calls", "failed", "input_tokens", "output_tokens", "cache_read_tokens",
+                               "cache_write_tokens", "cost_usd"), row)) for row in daily]
+        }
+
+    def export_api_calls(self, output: TextIO, fmt: str = "json", days: Optional[int] = None) -> int:
+        """Write api_calls rows, oldest first, as a JSON array or CSV; returns the row count"""
+        self.db.flush()
+        sql: str = f'SELECT {", ".join(API_CALL_COLUMNS)} FROM api_calls'
+        params: Tuple[Any, ...] = ()
+        if days is not None:
+            sql += " WHERE created_at >= datetime('now', ?)"
+            params = (f"-{days} days",)
+        rows: List[Tuple[Any, ...]] = self.db.query(sql + " ORDER BY id", params)
+
+        if fmt == "csv":
+            writer = csv.writer(output)
+            writer.writerow(API_CALL_COLUMNS)
+            writer.writerows(rows)
+        else:
+            json.dump([dict(zip(API_CALL_COLUMNS, row)) for row in rows], output, indent=2)
+            output.write("\n")
+        return len(rows)
+
+    def export_project(self, project_id: int) -> Dict[str, Any]:
+        """Everything stored for a project, as JSON-ready dicts"""
+        self.db.flush()
+        export: Dict[str, Any] = {}
+        with self.db.reader() as conn:
+            for key, sql in (
+                ("project", 'SELECT * FROM projects WHERE id = ?'),
+                ("conversations", 'SELECT * FROM conversations WHERE project_id = ? ORDER BY id'),
+                ("tasks", 'SELECT * FROM tasks WHERE project_id = ? ORDER BY id'),
+                ("insights", 'SELECT * FROM insights WHERE project_id = ? ORDER BY id')):
+                cursor: sqlite3.Cursor = conn.execute(sql, (project_id,))
+                columns: List[str] = [column[0] for column in cursor.description]
+                export[key] = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        export["project"] = export["project"][0] if export["project"] else None
+        return export
+
+    def database_id(self) -> str:
+        """Random id of this database, recorded in the archives it exports"""
+        return self.db.query_one("SELECT value FROM database_info WHERE key = 'database_id'")[0]
+
+    def export_archive(self, path: str, project_ids: Optional[Sequence[int]] = None,
+                       layout: str = "rows") -> Dict[str, int]:
+        """Stream projects with their conversations, tasks and insights to a JSONL archive
+
+        Every project is exported unless project_ids is given. With layout
+        "rows" each line after the header is one row; with "columns" each
+        line is a row group of up to ARCHIVE_BATCH_ROWS rows stored as one
+        array per column, which compresses better and loads straight into
+        column-oriented tools. Paths ending in .gz are gzip-compressed.
+        Rows are read in chunks inside one read transaction, so the archive
+        is a consistent snapshot and memory use stays flat however large
+        the history. Returns the number of rows written per table.
+        """
+        if layout not in ("rows", "columns"):
+            raise ValueError(f"Unknown archive layout: {layout}")
+        self.db.flush()
+        counts: Dict[str, int] = {}
+        encode: Callable[[Any], str] = json.JSONEncoder(ensure_ascii=False).encode
+        with self.db.reader() as conn, open_archive(path, "w") as output:
+            conn.execute('BEGIN')
+            try:
+                header: Dict[str, Any] = {
+                    "format": ARCHIVE_FORMAT,
+                    "version": ARCHIVE_VERSION,
+                    "layout": layout,
+                    "source": conn.execute("SELECT value FROM database_info WHERE key = 'database_id'").fetchone()[0],
+                    "exported_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                    "projects": list(project_ids) if project_ids is not None else None,
+                    "columns": ARCHIVE_COLUMNS
+                }
+                output.write(json.dumps(header) + "\n")
+
+                for table, columns in ARCHIVE_COLUMNS.items():
+                    # A scan in id order streams without sorting; NOT INDEXED
+                    # stops the planner from sorting an index range instead
+                    key: str = "id" if table == "projects" else "project_id"
+                    sql: str = f'SELECT {", ".join(columns)} FROM {table} NOT INDEXED WHERE {key} IS NOT NULL'
+                    params: Tuple[Any, ...] = ()
+                    if project_ids is not None:
+                        sql += f' AND {key} IN (SELECT value FROM json_each(?))'
+                        params = (json.dumps(list(project_ids)),)
+                    cursor: sqlite3.Cursor = conn.execute(sql + ' ORDER BY id', params)
+
+                    counts[table] = 0
+                    while True:
+                        rows: List[Tuple[Any, ...]] = cursor.fetchmany(ARCHIVE_BATCH_ROWS)
+                        if not rows:
+                            break
+                        if layout == "columns":
+                            output.write(encode({"table": table, "columns": columns,
+                                                 "data": [list(values) for values in zip(*rows)]}) + "\n")
+                        else:
+                            output.writelines(encode({"table": table, "row": dict(zip(columns, row))}) + "\n"
+                                              for row in rows)
+                        counts[table] += len(rows)
+            finally:
+                conn.rollback()
+        return counts
+
+    def import_archive(self, path: str) -> Dict[str, int]:
+        """Load an archive written by export_archive(), skipping rows already imported
+
+        Archived projects are matched to local ones through archive_imports,
+        so importing the same archive again, or a later one from the same
+        database, only adds new projects and rows. Rows are inserted
+        ARCHIVE_BATCH_ROWS at a time with Database.bulk_insert(), each batch
+        committed together with its import watermarks, so an interrupted
+        import can simply be run again. Returns rows inserted per table.
+        """
+        self.db.flush()
+        with open_archive(path, "r") as archive:
+            header: Dict[str, Any] = json.loads(archive.readline() or "{}")
+            if header.get("format") != ARCHIVE_FORMAT:
+                raise ValueError(f"{path} is not a {APP_NAME} archive")
+            if header.get("version", 0) > ARCHIVE_VERSION:
+                raise ValueError(f"{path} was written by a newer version of {APP_NAME}")
+            source: str = header["source"]
+            if source == self.database_id():
+                raise ValueError(f"{path} was exported from this database")
+
+            # source project id -> [local project id, conversations, tasks, insights watermarks]
+            imported: Dict[int, List[int]] = {row[0]: list(row[1:]) for row in self.db.query('''
+                SELECT source_project_id, project_id, conversations_through, tasks_through, insights_through
+                FROM archive_imports WHERE source_id = ?
+            ''', (source,))}
+            watermark: Dict[str, int] = {"conversations": 1, "tasks": 2, "insights": 3}
+            counts: Dict[str, int] = {table: 0 for table in ARCHIVE_COLUMNS}
+
+            for table, rows in read_archive(archive):
+                if table not in ARCHIVE_COLUMNS:
+                    continue
+                columns: List[str] = [column for column in ARCHIVE_COLUMNS[table] if column != "id"]
+                if table == "projects":
+                    new: List[Dict[str, Any]] = [row for row in rows if row["id"] not in imported]
+
+                    def map_projects(cursor: sqlite3.Cursor, first_id: int, last_id: int) -> None:
+                        for row, project_id in zip(new, range(first_id, last_id + 1)):
+                            imported[row["id"]] = [project_id, 0, 0, 0]
+                        cursor.executemany(
+                            'INSERT INTO archive_imports (source_id, source_project_id, project_id) VALUES (?, ?, ?)',
+                            [(source, row["id"], imported[row["id"]][0]) for row in new])
+
+                    self.db.bulk_insert(table, columns, [tuple(row.get(column) for column in columns)
+                                                         for row in new], map_projects)
+                    counts[table] += len(new)
+                    continue
+
+                # Rows of unknown projects, or at or below the project's watermark, are already here
+                slot: int = watermark[table]
+                new = [row for row in rows if row["project_id"] in imported
+                       and row["id"] > imported[row["project_id"]][slot]]
+                if not new:
+                    continue
+                if table == "conversations":
+                    for row in new:
+                        if row.get("token_count") is None:
+                            row["token_count"] = estimate_tokens(row["message"])
+                through: Dict[int, int] = {}
+                for row in new:
+                    through[row["project_id"]] = max(through.get(row["project_id"], 0), row["id"])
+
+                def advance(cursor: sqlite3.Cursor, first_id: int, last_id: int) -> None:
+                    cursor.executemany(f'''
+                        UPDATE archive_imports SET {table}_through = ?
+                        WHERE source_id = ? AND source_project_id = ?
+                    ''', [(last, source, source_project_id) for source_project_id, last in through.items()])
+
+                self.db.bulk_insert(table, columns, [
+                    tuple(imported[row["project_id"]][0] if column == "project_id" else row.get(column)
+                          for column in columns) for row in new], advance)
+                for source_project_id, last in through.items():
+                    imported[source_project_id][slot] = last
+                counts[table] += len(new)
+
+        self.stats_changed()
+        return counts
+
+    def close(self, drain: bool = False, timeout: float = 5.0) -> None:
+        """Stop agent calls and close the database
+
+        With drain, outstanding agent calls get up to timeout seconds to
+        finish first.
+        """
+        self.runtime.stop(timeout, drain=drain)
+        self.db.close()
+        TRACER.stop()